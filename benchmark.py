@@ -0,0 +1,173 @@
+"""Run the game without a window or real input and report how long each part of a frame takes.
+
+Usage: python benchmark.py [--scenario NAME] [--frames N] [--creatures N]
+
+Every scenario uses a fixed delta and seeded random numbers, so two runs
+of the same scenario simulate exactly the same frames and their timings
+can be compared to catch performance regressions.
+"""
+
+import argparse
+import math
+import os
+import random
+import sys
+
+# These have to be set up before pygame (and helpers, which loads fonts relative to the game's folder) are imported
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+import pygame
+
+import helpers
+import world
+import creature
+from gametools.ImageLoader import ImageLoader
+
+class ScriptedKeys:
+    """Stands in for pygame.key.get_pressed(), with the keys in `pressed` held down"""
+
+    def __init__(self, pressed=()):
+        self.pressed = set(pressed)
+
+    def __getitem__(self, key: int) -> bool:
+        return key in self.pressed
+
+class IdleInput:
+    """The player sits still"""
+
+    def __init__(self, game_world: world.World):
+        pass
+
+    def __call__(self, game_world: world.World, frame: int) -> ScriptedKeys:
+        return ScriptedKeys()
+
+def plan_route(game_world: world.World, start: pygame.Vector2, goal: pygame.Vector2, spacing: int = 10) -> list[pygame.Vector2]:
+    """Find a path along the roads and return a point every `spacing` cells along it"""
+    path = game_world.pathfinder.find_path(start, goal)
+    if path is None:
+        return [goal]
+
+    return path[spacing:-1:spacing] + [path[-1]]
+
+class RideToGrandmaInput:
+    """Pedal along the roads to grandma's house, steering towards the next point on the route"""
+
+    def __init__(self, game_world: world.World):
+        self.route = plan_route(game_world, game_world.player_sprite.position, game_world.grandma_position)
+        self.route_index = 0
+        self.last_position = None
+        self.stuck_frames = 0
+
+    def __call__(self, game_world: world.World, frame: int) -> ScriptedKeys:
+        player = game_world.player_sprite
+
+        to_target = self.route[self.route_index] - player.position
+        if to_target.length_squared() < 32 * 32 and self.route_index + 1 < len(self.route):
+            self.route_index += 1
+            to_target = self.route[self.route_index] - player.position
+
+        target_angle = math.degrees(math.atan2(-to_target.y, to_target.x))
+        angle_diff = (target_angle - player.orientation + 180) % 360 - 180
+
+        keys = []
+        if angle_diff > 2:
+            keys.append(pygame.K_a)
+        elif angle_diff < -2:
+            keys.append(pygame.K_d)
+
+        # Turn on the spot for sharp turns
+        if abs(angle_diff) > 45:
+            return ScriptedKeys(keys)
+        keys.append(pygame.K_w)
+
+        # The player slides along walls, but can still get wedged into a corner.
+        # Rather than trying to steer out, put them back on the route.
+        if player.velocity.y > 0 and player.position == self.last_position:
+            self.stuck_frames += 1
+        else:
+            self.stuck_frames = 0
+        self.last_position = player.position.copy()
+        if self.stuck_frames > 30:
+            self.stuck_frames = 0
+            player.position = self.route[self.route_index].copy()
+
+        return ScriptedKeys(keys)
+
+def add_creatures(game_world: world.World, count: int, spread: float, rng: random.Random) -> None:
+    """Place `count` extra creatures on walkable spots within `spread` px of the player,
+    but not so close that they notice the player right away.
+    """
+    placed = 0
+    while placed < count:
+        offset = pygame.Vector2(rng.uniform(-spread, spread), rng.uniform(-spread, spread))
+        position = game_world.player_sprite.position + offset
+        if offset.length() > helpers.CENTER_X and game_world.is_coord_in_mask(position):
+            game_world.add_entity(creature.Creature(position, game_world))
+            placed += 1
+
+SCENARIOS = {
+    "idle": IdleInput,
+    "ride": RideToGrandmaInput,
+}
+
+def run_scenario(screen: pygame.Surface, name: str, frames: int, delta: float, creatures: int, seed: int, batch_physics: bool = True, dirty_rendering: bool = False) -> world.World:
+    game_world = world.World(batch_creature_physics=batch_physics, dirty_rendering=dirty_rendering, seed=seed)
+    add_creatures(game_world, creatures, 3000, random.Random(seed))
+    get_input = SCENARIOS[name](game_world)
+
+    timer = game_world.timer
+    timer.history_length = frames
+    timer.reset()
+    for frame in range(frames):
+        with timer.phase("input"):
+            game_world.handle_input(get_input(game_world, frame))
+        with timer.phase("update"):
+            game_world.update(delta)
+
+        game_world.draw(screen)
+        timer.end_frame()
+
+        if not game_world.player_sprite.alive() or game_world.won:
+            break
+
+    return game_world
+
+def print_report(name: str, game_world: world.World) -> None:
+    summary = game_world.timer.summary()
+    frames = len(game_world.timer.history.get("update", ()))
+    print(f"{name}: {frames} frames, {len(game_world.other_entity_group)} entities, "
+          f"player at ({game_world.player_sprite.position.x:.0f}, {game_world.player_sprite.position.y:.0f})")
+    print(f"  last frame drew {game_world.drawn_count} sprites, culled {game_world.culled_count} off screen")
+    print(f"  {'phase':<12}{'mean ms':>10}{'p95 ms':>10}{'max ms':>10}")
+    total = 0
+    for phase, (mean, p95, worst) in summary.items():
+        total += mean
+        print(f"  {phase:<12}{mean:>10.3f}{p95:>10.3f}{worst:>10.3f}")
+    print(f"  {'total':<12}{total:>10.3f}")
+    ImageLoader.DumpStats(largest=5)
+
+def run():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenario", choices=[*SCENARIOS, "all"], default="all")
+    parser.add_argument("--frames", type=int, default=600)
+    parser.add_argument("--delta", type=float, default=1 / 144, help="seconds simulated per frame")
+    parser.add_argument("--creatures", type=int, default=0, help="extra creatures to scatter around the player")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-batch-physics", action="store_true", help="update creatures one by one instead of with CreaturePhysics")
+    parser.add_argument("--dirty-rects", action="store_true", help="only redraw the parts of the screen that changed")
+    args = parser.parse_args()
+
+    pygame.init()
+    screen = pygame.display.set_mode(helpers.SCREEN_SIZE)
+
+    names = SCENARIOS if args.scenario == "all" else [args.scenario]
+    for name in names:
+        game_world = run_scenario(screen, name, args.frames, args.delta, args.creatures, args.seed, not args.no_batch_physics, args.dirty_rects)
+        print_report(name, game_world)
+
+    pygame.quit()
+
+if __name__ == "__main__":
+    sys.exit(run())
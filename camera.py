@@ -27,6 +27,19 @@ class Camera:
         offset_from_camera_world = coord - Camera.SCREEN_CENTER
         return (offset_from_camera_world / self.scale) + self._position
 
+    def view_rect(self, margin: float = 0) -> pygame.Rect:
+        """The part of the world that is on the screen, in world space, grown by `margin` px on every side"""
+        topleft = self.screen_to_world(pygame.Vector2()) - pygame.Vector2(margin, margin)
+        bottomright = self.screen_to_world(Camera.SCREEN_CENTER * 2) + pygame.Vector2(margin, margin)
+        return pygame.Rect(topleft, bottomright - topleft)
+
+    def screen_rect_to_world(self, rect: pygame.Rect) -> pygame.Rect:
+        """The part of the world that shows in `rect` on the screen, rounded out to whole pixels"""
+        topleft = self.screen_to_world(pygame.Vector2(rect.topleft))
+        bottomright = self.screen_to_world(pygame.Vector2(rect.bottomright))
+        left, top = int(topleft.x) - 1, int(topleft.y) - 1
+        return pygame.Rect(left, top, int(bottomright.x) + 2 - left, int(bottomright.y) + 2 - top)
+
     def get_scale(self) -> float:
         return self._scale
 
@@ -1,7 +1,5 @@
 from __future__ import annotations
 
-import glob
-
 import pygame
 from creature_states import CreatureStateAttacking, CreatureStateSeeking, CreatureStateWaiting
 import entity
@@ -15,7 +13,10 @@ class Creature(entity.Entity):
 
     def __init__(self, position: pygame.Vector2, world: world.World):
         entity.Entity.__init__(self, position, None, world)
-        self.target: pygame.Vector2 = None
+        # Set when the creature is moved by the world's CreaturePhysics rather than by itself
+        self.physics = None
+        self._target: pygame.Vector2 = None
+        self.visible = False
 
         # States
         waiting_state = CreatureStateWaiting(self, self.world.player_sprite)
@@ -31,24 +32,43 @@ class Creature(entity.Entity):
         self.animations = {}
         self.current_animation = None
 
-        path_start = "assets/imgs/Creature/"
-        for fname in glob.iglob(path_start + "*.png"):
-            ImageLoader.ImageLoader.GetImage(fname, alpha=True) # Cache all the images
-
-        self.animations['idle'] = ImageLoader.ImageLoader.return_image_set("creature_idle", None, True)
-        self.animations['death'] = ImageLoader.ImageLoader.return_image_set("creature_death", None, True)
-        self.animations['bite'] = ImageLoader.ImageLoader.return_image_set("creature_Bite", None, True)
+        # Every creature shares the same frames
+        ImageLoader.ImageLoader.IndexAnimations("assets/imgs/Creature")
+        self.animations['idle'] = ImageLoader.ImageLoader.GetAnimation("creature_idle", alpha=True)
+        self.animations['death'] = ImageLoader.ImageLoader.GetAnimation("creature_death", alpha=True)
+        self.animations['bite'] = ImageLoader.ImageLoader.GetAnimation("creature_Bite", alpha=True)
         self.set_animation('idle')
 
     def update(self, delta: float) -> None:
-        self.state_manager.do_state()
+        self.think(delta)
 
-        self.update_animation(delta)
-        
         acceleration = pygame.Vector2()
         if self.target is not None:
             target_offset = self.target - self.position
             if target_offset.length_squared() > self.speed * self.speed:
                 target_offset.scale_to_length(self.speed)
             acceleration = target_offset - self.velocity
-        super().update(acceleration, delta)
\ No newline at end of file
+        super().update(acceleration, delta)
+
+    def think(self, delta: float) -> None:
+        """Everything in an update apart from moving, which CreaturePhysics can do for many creatures at once"""
+        self.state_manager.do_state()
+        self.update_animation(delta)
+
+    def stop(self) -> None:
+        self.velocity.update(0, 0)
+        if self.physics is not None:
+            self.physics.stop(self)
+
+    """Properties"""
+
+    def get_target(self) -> pygame.Vector2 | None:
+        return self._target
+
+    def set_target(self, new_target: pygame.Vector2 | None) -> None:
+        self._target = new_target
+        if self.physics is not None:
+            self.physics.set_target(self, new_target)
+
+    """Where the creature is heading, or None to slow down and stop"""
+    target = property(get_target, set_target)
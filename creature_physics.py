@@ -0,0 +1,138 @@
+import numpy as np
+import pygame
+
+class CreaturePhysics:
+    """Moves every creature in one go with NumPy, instead of each one doing its own Vector2 math.
+
+    The positions, velocities and targets of the creatures are kept in
+    arrays, one row (slot) per creature. Creatures still decide where they
+    want to go themselves (their states set `target`), `step` then does the
+    steering and movement from Creature.update and Entity.update for all of
+    them at once. The results are copied back to the sprites, and only the
+    ones in `view_rect` get their image updated.
+    """
+
+    def __init__(self, capacity: int = 64):
+        self.positions = np.zeros((capacity, 2))
+        self.velocities = np.zeros((capacity, 2))
+        self.targets = np.zeros((capacity, 2))
+        self.has_target = np.zeros(capacity, dtype=bool)
+        self.speeds = np.zeros(capacity)
+
+        # The creature in each slot, and the slot of each creature
+        self.entities = []
+        self.slots = {}
+
+    def __len__(self) -> int:
+        return len(self.entities)
+
+    def __contains__(self, creature) -> bool:
+        return creature in self.slots
+
+    def add(self, creature) -> None:
+        if creature in self.slots:
+            return
+
+        slot = len(self.entities)
+        if slot == len(self.positions):
+            self.grow()
+        self.entities.append(creature)
+        self.slots[creature] = slot
+
+        self.positions[slot] = creature.position
+        self.velocities[slot] = creature.velocity
+        self.speeds[slot] = creature.speed
+        self.set_target(creature, creature.target)
+        creature.physics = self
+
+    def remove(self, creature) -> None:
+        slot = self.slots.pop(creature, None)
+        if slot is None:
+            return
+        creature.physics = None
+        # Carry on from where the arrays left off
+        creature.velocity.update(self.velocities[slot].tolist())
+
+        # Move the last creature into the empty slot so the arrays stay packed
+        last_slot = len(self.entities) - 1
+        last_creature = self.entities.pop()
+        if slot != last_slot:
+            self.entities[slot] = last_creature
+            self.slots[last_creature] = slot
+            for array in (self.positions, self.velocities, self.targets, self.has_target, self.speeds):
+                array[slot] = array[last_slot]
+
+    def clear(self) -> None:
+        for slot, creature in enumerate(self.entities):
+            creature.physics = None
+            creature.velocity.update(self.velocities[slot].tolist())
+        self.entities = []
+        self.slots = {}
+
+    def grow(self) -> None:
+        capacity = len(self.positions) * 2
+        for name in ("positions", "velocities", "targets", "has_target", "speeds"):
+            array = getattr(self, name)
+            grown = np.zeros((capacity, *array.shape[1:]), dtype=array.dtype)
+            grown[:len(array)] = array
+            setattr(self, name, grown)
+
+    def set_target(self, creature, target: pygame.Vector2 | None) -> None:
+        slot = self.slots[creature]
+        self.has_target[slot] = target is not None
+        if target is not None:
+            self.targets[slot] = (target.x, target.y)
+
+    def stop(self, creature) -> None:
+        self.velocities[self.slots[creature]] = 0
+
+    def step(self, updates: list[tuple[object, float]], view_rect: pygame.Rect) -> None:
+        """Move the creatures in `updates` by their delta, see SimulationLOD.entities_to_update"""
+        if not updates:
+            return
+
+        slots = np.fromiter((self.slots[creature] for creature, _ in updates), dtype=np.intp, count=len(updates))
+        deltas = np.fromiter((delta for _, delta in updates), dtype=np.float64, count=len(updates))[:, np.newaxis]
+        positions = self.positions[slots]
+        velocities = self.velocities[slots]
+        speeds = self.speeds[slots][:, np.newaxis]
+
+        # Steer towards the target, the same as Creature.update
+        target_offsets = self.targets[slots] - positions
+        lengths = np.linalg.norm(target_offsets, axis=1, keepdims=True)
+        target_offsets *= np.where(lengths > speeds, speeds / np.maximum(lengths, 1e-12), 1.0)
+        accelerations = np.where(self.has_target[slots][:, np.newaxis], target_offsets - velocities, 0.0)
+
+        # And move, the same as Entity.update
+        velocities += accelerations * deltas
+        lengths = np.linalg.norm(velocities, axis=1, keepdims=True)
+        velocities *= np.where(lengths > speeds, speeds / np.maximum(lengths, 1e-12), 1.0)
+        positions += velocities * deltas
+
+        self.positions[slots] = positions
+        self.velocities[slots] = velocities
+        self.sync(slots, view_rect)
+
+    def sync(self, slots: np.ndarray, view_rect: pygame.Rect) -> None:
+        """Copy the results back to the sprites. Every creature that was stepped gets its new position,
+        velocity and orientation, the same as Entity.update, and the ones on screen also get their
+        image (for their animation) updated.
+        """
+        positions = self.positions[slots]
+        velocities = self.velocities[slots]
+        moving = np.any(velocities != 0, axis=1)
+        on_screen = ((positions[:, 0] >= view_rect.left) & (positions[:, 0] < view_rect.right) &
+                     (positions[:, 1] >= view_rect.top) & (positions[:, 1] < view_rect.bottom))
+        # Entities face the direction in which they are moving, and 270 when they stand still like as_polar gives
+        orientations = (np.degrees(np.arctan2(-velocities[:, 1], velocities[:, 0])) - 90) % 360
+
+        for slot, position, velocity, orientation, is_moving, is_on_screen in zip(
+                slots.tolist(), positions.tolist(), velocities.tolist(), orientations.tolist(),
+                moving.tolist(), on_screen.tolist()):
+            creature = self.entities[slot]
+            if is_moving:
+                creature.position.update(position)
+            creature.velocity.update(velocity)
+            creature.orientation = orientation
+            if is_on_screen:
+                creature.update_rect()
@@ -14,7 +14,7 @@ class CreatureStateWaiting(State):
     def entry_actions(self) -> None:
         self.creature_sprite.set_animation('idle')
         self.creature_sprite.target = None
-        self.creature_sprite.velocity.update(0, 0)
+        self.creature_sprite.stop()
 
     def exit_actions(self) -> None:
         pass
@@ -23,8 +23,8 @@ class CreatureStateWaiting(State):
         pass
 
     def check_conditions(self) -> str | None:
-        offset = self.player_sprite_target.position - self.creature_sprite.position
-        if offset.length() < SEEK_DISTANCE:
+        # The world keeps track of which creatures are within SEEK_DISTANCE of the player
+        if self.creature_sprite in self.creature_sprite.world.entities_near_player:
             return "seeking"
 
         return None
@@ -44,7 +44,9 @@ class CreatureStateSeeking(State):
         pass
 
     def do_actions(self) -> None:
-        self.creature_sprite.target = self.target_sprite.position.copy()
+        # Follow the roads to the player rather than going straight through the walls
+        pathfinder = self.creature_sprite.world.pathfinder
+        self.creature_sprite.target = pathfinder.steer_target(self.creature_sprite.position, self.target_sprite.position)
 
     def check_conditions(self) -> str | None:
         offset = self.target_sprite.position - self.creature_sprite.position
@@ -4,12 +4,17 @@ import pygame
 from state_manager import StateManager
 import world
 
+from gametools import ImageLoader
+
 class Entity(pygame.sprite.Sprite):
     """An entity is an object that is not part of the terrain, and can move and interact with other
     entities.
     """
 
     next_id = 0
+    # Rotated images come from ImageLoader's cache, shared with every entity showing the same frame.
+    # Entities that change their image after rotating it need their own copy instead.
+    share_rotations = True
 
     def __init__(self, position: pygame.Vector2(), base_image: pygame.Surface, world: world.World):
         pygame.sprite.Sprite.__init__(self)
@@ -89,7 +94,11 @@ class Entity(pygame.sprite.Sprite):
     def update_image_rotation(self) -> None:
         # Update the sprite's image to correspond with the updated rotation
         if self.dirty:
-            self.image = pygame.transform.rotate(self.base_image, self.orientation)
+            if self.share_rotations:
+                self.image = ImageLoader.ImageLoader.GetRotatedImage(self.base_image, self.orientation)
+            else:
+                self.image = pygame.transform.rotate(self.base_image, self.orientation)
+            self.dirty = False
 
     def update_animation(self, delta: float) -> None:
         if self.current_animation is None:
@@ -100,7 +109,10 @@ class Entity(pygame.sprite.Sprite):
             self.animation_index += 1
             self.animation_index %= len(self.current_animation)
 
-        self.base_image = self.current_animation[self.animation_index]
+        frame = self.current_animation[self.animation_index]
+        if frame is not self.base_image:
+            self.base_image = frame
+            self.dirty = True
         self.animation_timer -= delta
 
     def add_animation(self, name: str, image_list: list[pygame.Surface]):
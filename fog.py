@@ -0,0 +1,154 @@
+import time
+
+import pygame
+
+import helpers
+
+class Fog:
+    """Darkness that covers the screen, with holes cut out of it for what the player can see.
+
+    The surfaces are kept between frames, and the fog is only redrawn when
+    something that affects it changes: the ambient light shrinking or the
+    headlight turning / flickering.
+    """
+
+    # The ambient light around the player is drawn as a few rings: (radius, alpha)
+    AMBIENT_RINGS = ((400, 5), (200, 127), (175, 255))
+
+    def __init__(self, size: tuple[int, int] = helpers.SCREEN_SIZE):
+        # self.image acts as a mask, and we subtract from it what the player CAN see
+        self.image = pygame.Surface(size, pygame.SRCALPHA)
+        self.image.fill((0, 0, 0))
+        self.view_image = pygame.Surface(size, pygame.SRCALPHA)
+        self.view_image.fill((0, 0, 0, 0))
+        self.center = pygame.Vector2(size) / 2
+
+        # Ring radii -> (image, position on the screen). The radius only ever shrinks,
+        # so there is no reason to keep more than the latest couple of sizes around.
+        self.ring_images: dict[tuple[int, ...], tuple[pygame.Surface, tuple[int, int]]] = {}
+        self.max_ring_images = 2
+
+        self.last_state = None
+        self.last_area = pygame.Rect(0, 0, 0, 0)
+        self.last_light_rect = pygame.Rect(0, 0, 0, 0)
+        # The part of the screen that looks different after the last redraw
+        self.redraw_area = pygame.Rect(0, 0, 0, 0)
+
+        # Set to True each time update() actually had to redraw the fog
+        self.changed = True
+
+    def get_ring_image(self, radii: tuple[int, ...]) -> tuple[pygame.Surface, tuple[int, int]] | None:
+        """Return an image of the ambient light rings with the given radii, and where it goes on screen"""
+        if radii in self.ring_images:
+            return self.ring_images[radii]
+
+        outer_radius = max(radii)
+        if outer_radius <= 0:
+            return None
+
+        # Only as big as the outermost ring. Offsetting by a whole number of pixels keeps
+        # the circles identical to ones drawn straight onto a full screen surface.
+        topleft = (int(self.center.x) - outer_radius - 1, int(self.center.y) - outer_radius - 1)
+        ring_image = pygame.Surface((outer_radius * 2 + 2, outer_radius * 2 + 2), pygame.SRCALPHA)
+        ring_image.fill((0, 0, 0, 0))
+        ring_center = self.center - pygame.Vector2(topleft)
+        for radius, (_, alpha) in zip(radii, Fog.AMBIENT_RINGS):
+            pygame.draw.circle(ring_image, (255, 255, 255, alpha), ring_center, radius)
+
+        if len(self.ring_images) >= self.max_ring_images:
+            self.ring_images.pop(next(iter(self.ring_images)))
+        self.ring_images[radii] = (ring_image, topleft)
+        return self.ring_images[radii]
+
+    def update(self, fog_timer: float, headlight, lights: list[tuple[pygame.Surface, pygame.Rect]] = ()) -> None:
+        """Redraw the fog if the ambient light, the headlight or the other `lights` (their images and
+        where they are on the screen, see Lighting.screen_lights) have changed since last frame"""
+        radii = tuple(int(radius - fog_timer) for radius, _ in Fog.AMBIENT_RINGS)
+        light_image = headlight.image
+        lights_state = tuple((id(image), rect.topleft) for image, rect in lights)
+        state = (radii, lights_state, headlight.orientation, light_image.get_alpha(), light_image.get_size())
+        self.changed = state != self.last_state
+        if not self.changed:
+            return
+        only_light_changed = self.last_state is not None and self.last_state[:2] == (radii, lights_state)
+        self.last_state = state
+
+        # Everything outside of the rings and the headlight stays completely dark, so only
+        # the area covered by them this frame or the last one needs to be touched.
+        light_rect = light_image.get_rect()
+        light_rect.center = self.center
+        ring = self.get_ring_image(radii)
+        area = light_rect.copy()
+        if ring is not None:
+            area.union_ip(pygame.Rect(ring[1], ring[0].get_size()))
+        for _, rect in lights:
+            area.union_ip(rect)
+        redraw_area = area.union(self.last_area)
+        self.last_area = area
+        # When the headlight only flickers or turns the rings stay the same, and only it has to be shown again
+        self.redraw_area = light_rect.union(self.last_light_rect) if only_light_changed else redraw_area
+        self.last_light_rect = light_rect
+
+        self.view_image.fill((0, 0, 0, 0), redraw_area)
+        if ring is not None:
+            self.view_image.blit(ring[0], ring[1])
+        for image, rect in lights:
+            self.view_image.blit(image, rect)
+        self.view_image.blit(light_image, light_rect)
+
+        self.image.fill((0, 0, 0), redraw_area)
+        self.image.blit(self.view_image, redraw_area, redraw_area, special_flags=pygame.BLEND_RGBA_SUB)
+
+
+def create_fog_image_uncached(fog_timer: float, headlight) -> pygame.Surface:
+    """The original way of drawing the fog, allocating and redrawing everything each time.
+    Only kept around to compare against in benchmark()
+    """
+
+    fog_image = pygame.Surface(helpers.SCREEN_SIZE, pygame.SRCALPHA)
+    fog_image.fill((0, 0, 0))
+
+    view_image = pygame.Surface(helpers.SCREEN_SIZE, pygame.SRCALPHA)
+    pygame.draw.circle(view_image, (255, 255, 255, 5), helpers.CENTER, 400 - fog_timer)
+    pygame.draw.circle(view_image, (255, 255, 255, 127), helpers.CENTER, 200 - fog_timer)
+    pygame.draw.circle(view_image, (255, 255, 255, 255), helpers.CENTER, 175 - fog_timer)
+
+    light_rect = headlight.rect.copy()
+    light_rect.center = helpers.CENTER
+    view_image.blit(headlight.image, light_rect)
+
+    fog_image.blit(view_image, (0, 0), special_flags=pygame.BLEND_RGBA_SUB)
+    return fog_image
+
+def benchmark(frames: int = 1000, delta: float = 1 / 144) -> None:
+    """Print the average frame time of the old and new fog with a flickering, turning headlight"""
+    # The entity modules import each other through world, so it has to be imported first
+    import world
+    import light
+
+    pygame.display.set_mode(helpers.SCREEN_SIZE)
+    headlight = light.Light(pygame.Vector2(helpers.CENTER), None)
+    fog = Fog()
+
+    scenarios = {
+        "idle": 0,
+        "turning": 90,
+    }
+    for name, rotation_speed in scenarios.items():
+        for label, draw_fog in (("uncached", lambda timer: create_fog_image_uncached(timer, headlight)),
+                                ("cached", lambda timer: fog.update(timer, headlight))):
+            headlight.timer = 0
+            headlight.orientation = 0
+            fog_timer = 0
+            start = time.perf_counter()
+            for _ in range(frames):
+                headlight.orientation += rotation_speed * delta
+                headlight.update_rect()
+                headlight.update(delta)
+                draw_fog(fog_timer)
+                fog_timer += delta
+            frame_ms = (time.perf_counter() - start) / frames * 1000
+            print(f"{name:>8} {label:>8}: {frame_ms:.3f} ms/frame")
+
+if __name__ == "__main__":
+    benchmark()
@@ -1,11 +1,63 @@
+import glob
+import os
+import re
+from collections import OrderedDict
+
 import pygame
 
+from gametools import atlas
+from gametools.decoded_cache import DecodedCache
+
 class ImageLoader:
     """Helper class to handle loading images from paths, ensuring we don't
     reload the same image multiple times (for performance reasons)"""
 
-    # Class variable to store references to the loaded images for each unique path
-    loaded_images_cache = {}
+    # Class variable to store references to the loaded images for each unique path.
+    # These are the originals, which are never evicted since entities hold on to them anyway.
+    loaded_images_cache: dict[str, pygame.Surface] = {}
+    loaded_images_bytes = 0
+
+    # Copies of the originals at other sizes, (path, size) -> image. The least recently used
+    # are dropped once they take up more than `max_scaled_bytes`, they can always be scaled again.
+    scaled_images_cache: OrderedDict[tuple[str, tuple[int, int]], pygame.Surface] = OrderedDict()
+    max_scaled_bytes = 32 * 1024 * 1024
+    scaled_images_bytes = 0
+
+    # Animation name -> paths of its frames in order, filled in by IndexAnimations. A frame is a file
+    # named like `creature_idle2.png`, the name of the animation followed by the frame number.
+    animation_index: dict[str, tuple[str, ...]] = {}
+    indexed_folders: set[str] = set()
+    # (animation name, size, alpha) -> frames, shared by every entity using the animation
+    animations_cache: dict[tuple, tuple[pygame.Surface, ...]] = {}
+
+    # Path -> (atlas image, where the image is in it), filled in by UseAtlas. Images that are in an
+    # atlas are served as subsurfaces of it when they are asked for with alpha, instead of being
+    # loaded from their own files.
+    atlas_regions: dict[str, tuple[pygame.Surface, pygame.Rect]] = {}
+    loaded_atlases: set[str] = set()
+
+    # How often each cache had what was asked for, see GetStats
+    stats = {"hits": 0, "misses": 0, "scaled_hits": 0, "scaled_misses": 0, "scaled_evictions": 0,
+             "rotated_hits": 0, "rotated_misses": 0, "rotated_evictions": 0, "rotated_unshared": 0}
+
+    # Masks made from images with pygame.mask.from_threshold, (path, color, threshold) -> mask
+    loaded_masks_cache: dict[tuple, pygame.mask.Mask] = {}
+
+    # Decoded images and masks are saved here so they don't have to be decoded again next time.
+    # Set to None to always decode from the source files.
+    disk_cache: DecodedCache | None = DecodedCache()
+
+    # Rotated copies of images shared between every entity, (image, angle) -> rotated image.
+    # Angles are rounded to the nearest `rotation_step` degrees so that entities facing
+    # almost the same direction share a frame, and the least recently used frames are
+    # dropped once they take up more than `max_rotated_bytes`.
+    rotated_images_cache: OrderedDict[tuple[pygame.Surface, float], pygame.Surface] = OrderedDict()
+    rotation_step = 1.0
+    max_rotated_bytes = 64 * 1024 * 1024
+    rotated_images_bytes = 0
+    # Images bigger than this are rotated without being cached. They are rarely shared, and every
+    # angle of one would push out lots of the small frames the cache is for.
+    max_shared_rotation_bytes = 256 * 1024
 
     @staticmethod
     def AddImageToAnimation(animation: list, path: str, override_size: tuple[int, int] = None) -> None:
@@ -21,43 +73,253 @@ class ImageLoader:
 
         If the image is already loaded, return the stored image in the dictionary, 
         otherwise load the corresponding image and update the internal dictonary.
+        Images at an `override_size` other than their own are kept in a separate,
+        size limited cache.
         
-        Will raise FileNotFoundError if file isn't found at given path
-        Will raise AssertionError if the path is defined in the dictionary but there is no default size"""
+        Will raise FileNotFoundError if file isn't found at given path"""
 
-        image_to_add = None
-        image_sizes = ImageLoader.loaded_images_cache.get(path)
-        if image_sizes is None:
+        image_to_add = ImageLoader.loaded_images_cache.get(path)
+        if image_to_add is None and alpha and path in ImageLoader.atlas_regions:
+            ImageLoader.stats["hits"] += 1
+            atlas_image, region = ImageLoader.atlas_regions[path]
+            image_to_add = atlas_image.subsurface(region)
+            ImageLoader.loaded_images_cache[path] = image_to_add
+        elif image_to_add is None:
             # We have not loaded this image before
-            ImageLoader.loaded_images_cache[path] = {}
-            image_to_add = pygame.image.load(path)
-            if alpha:
-                image_to_add = image_to_add.convert_alpha()
-            else:
-                image_to_add = image_to_add.convert()
-            size = image_to_add.get_size()
-            ImageLoader.loaded_images_cache[path][None] = image_to_add
-            ImageLoader.loaded_images_cache[path][size] = image_to_add
-
-            # If override_size was passed in before loading the default size we need
-            # to resize and add that result.
-            if override_size is not None and size != override_size:
-                image_to_add = pygame.transform.scale(image_to_add, override_size)
-                ImageLoader.loaded_images_cache[path][override_size] = image_to_add
-
+            ImageLoader.stats["misses"] += 1
+            image_to_add = ImageLoader.AddDecodedImage(path, ImageLoader.LoadDecodedImage(path), alpha)
         else:
-            image_to_add = image_sizes.get(override_size)
-            if image_to_add is None:
-                # We have loaded the image, but not at this size
-                image_to_resize = image_sizes[None]
-                assert image_to_resize is not None
+            ImageLoader.stats["hits"] += 1
+
+        if override_size is not None and image_to_add.get_size() != override_size:
+            image_to_add = ImageLoader.GetScaledImage(path, image_to_add, override_size)
+
+        return image_to_add
+
+    @staticmethod
+    def GetScaledImage(path: str, image: pygame.Surface, size: tuple[int, int]) -> pygame.Surface:
+        """Return `image` (the original loaded from `path`) scaled to `size`"""
+
+        key = (path, size)
+        scaled_image = ImageLoader.scaled_images_cache.get(key)
+        if scaled_image is not None:
+            ImageLoader.stats["scaled_hits"] += 1
+            ImageLoader.scaled_images_cache.move_to_end(key)
+            return scaled_image
+
+        ImageLoader.stats["scaled_misses"] += 1
+        scaled_image = pygame.transform.scale(image, size)
+        ImageLoader.scaled_images_cache[key] = scaled_image
+        ImageLoader.scaled_images_bytes += ImageLoader.GetImageBytes(scaled_image)
+        while ImageLoader.scaled_images_bytes > ImageLoader.max_scaled_bytes and len(ImageLoader.scaled_images_cache) > 1:
+            _, evicted_image = ImageLoader.scaled_images_cache.popitem(last=False)
+            ImageLoader.scaled_images_bytes -= ImageLoader.GetImageBytes(evicted_image)
+            ImageLoader.stats["scaled_evictions"] += 1
 
-                image_to_add = pygame.transform.scale(image_to_resize, override_size)
-                image_sizes[override_size] = image_to_add
+        return scaled_image
 
+    @staticmethod
+    def LoadDecodedImage(path: str) -> pygame.Surface:
+        """Decode the image at `path` (or read it from the disk cache), without converting it
+        to the display's format. Safe to call from other threads."""
+
+        disk_cache = ImageLoader.disk_cache
+        if disk_cache is None:
+            return pygame.image.load(path)
+
+        decoded_image = disk_cache.load_image(path)
+        if decoded_image is None:
+            decoded_image = pygame.image.load(path)
+            disk_cache.save_image(path, decoded_image)
+        return decoded_image
+
+    @staticmethod
+    def AddDecodedImage(path: str, decoded_image: pygame.Surface, alpha=False) -> pygame.Surface:
+        """Convert an image that was loaded from `path` elsewhere (like on an AssetLoader
+        thread) to the display's format and cache it as if GetImage had loaded it.
+        Has to be called from the main thread."""
+
+        if alpha:
+            image_to_add = decoded_image.convert_alpha()
+        else:
+            image_to_add = decoded_image.convert()
+        ImageLoader.loaded_images_cache[path] = image_to_add
+        ImageLoader.loaded_images_bytes += ImageLoader.GetImageBytes(image_to_add)
         return image_to_add
 
+    @staticmethod
+    def GetMask(path: str, color: tuple, threshold: tuple) -> pygame.mask.Mask:
+        """Return a mask of the pixels in the image at `path` within `threshold` of `color`.
+        The image itself isn't kept around, so this is a lot lighter than GetImage for huge images."""
+
+        key = (path, color, threshold)
+        mask = ImageLoader.loaded_masks_cache.get(key)
+        if mask is None:
+            mask = ImageLoader.CreateMask(path, color, threshold)
+            ImageLoader.loaded_masks_cache[key] = mask
+
+        return mask
+
+    @staticmethod
+    def CreateMask(path: str, color: tuple, threshold: tuple) -> pygame.mask.Mask:
+        """Build the mask for GetMask (or read it from the disk cache) without keeping it in memory.
+        Safe to call from other threads."""
+
+        disk_cache = ImageLoader.disk_cache
+        key = "_".join(str(val) for val in (*color, *threshold))
+        mask = disk_cache.load_mask(path, key) if disk_cache is not None else None
+        if mask is None:
+            # The pixels of the image aren't cached, only the mask made from them is needed
+            mask = pygame.mask.from_threshold(pygame.image.load(path), color, threshold=threshold)
+            if disk_cache is not None:
+                disk_cache.save_mask(path, key, mask)
+        return mask
+
+    @staticmethod
+    def AddMask(path: str, color: tuple, threshold: tuple, mask: pygame.mask.Mask) -> None:
+        ImageLoader.loaded_masks_cache[(path, color, threshold)] = mask
+
+    @staticmethod
+    def UseAtlas(folders: list[str], atlas_path: str, decoded_atlas: pygame.Surface | None = None) -> None:
+        """Serve the images in `folders` from one atlas image (see gametools.atlas) instead of their
+        own files, building the atlas first if it is out of date. `decoded_atlas` can be passed in
+        if the atlas image was already decoded elsewhere, like on an AssetLoader thread."""
+
+        if atlas_path in ImageLoader.loaded_atlases:
+            return
+        ImageLoader.loaded_atlases.add(atlas_path)
+
+        if not atlas.is_atlas_current(folders, atlas_path):
+            atlas.build_atlas(folders, atlas_path)
+            decoded_atlas = None
+        index = atlas.read_atlas_index(atlas_path)
+
+        if decoded_atlas is None:
+            decoded_atlas = ImageLoader.LoadDecodedImage(atlas_path + ".png")
+        atlas_image = decoded_atlas.convert_alpha()
+        ImageLoader.loaded_images_bytes += ImageLoader.GetImageBytes(atlas_image)
+        for path, region in index["frames"].items():
+            ImageLoader.atlas_regions[path] = (atlas_image, pygame.Rect(region))
+
+    @staticmethod
+    def IndexAnimations(folder: str) -> None:
+        """Find the animation frames in `folder`, only looks at the disk the first time it is called for a folder"""
+
+        if folder in ImageLoader.indexed_folders:
+            return
+        ImageLoader.indexed_folders.add(folder)
+
+        frames: dict[str, list[tuple[int, str]]] = {}
+        for path in glob.iglob(os.path.join(folder, "*.png")):
+            match = re.fullmatch(r"(.*?)(\d+)", os.path.splitext(os.path.basename(path))[0])
+            if match is not None:
+                frames.setdefault(match.group(1), []).append((int(match.group(2)), path))
+
+        for name, numbered_paths in frames.items():
+            # Sort by the frame number so frame 10 comes after frame 2
+            ImageLoader.animation_index[name] = tuple(path for _, path in sorted(numbered_paths))
+
+    @staticmethod
+    def GetAnimation(name: str, override_size: tuple[int, int] | None = None, alpha: bool = False) -> tuple[pygame.Surface, ...]:
+        """Return the frames of an animation found by IndexAnimations, loading them if needed.
+        The tuple is shared between everything that asks for the same animation.
+
+        Will raise KeyError if there is no animation with that name"""
+
+        key = (name, override_size, alpha)
+        frames = ImageLoader.animations_cache.get(key)
+        if frames is None:
+            frames = tuple(ImageLoader.GetImage(path, override_size, alpha) for path in ImageLoader.animation_index[name])
+            ImageLoader.animations_cache[key] = frames
+
+        return frames
+
     @staticmethod
     def return_image_set(pattern: str, override_size: tuple[int, int] | None = None, alpha: bool = False) -> list[pygame.Surface]:
+        """Return the frames of the animation called `pattern`, or, if there isn't one,
+        every loaded image with `pattern` in its path"""
+
+        if pattern in ImageLoader.animation_index:
+            return list(ImageLoader.GetAnimation(pattern, override_size, alpha))
+
         matching_paths = [path for path in ImageLoader.loaded_images_cache if pattern in path]
-        return [ImageLoader.GetImage(path, override_size, alpha) for path in matching_paths]
\ No newline at end of file
+        return [ImageLoader.GetImage(path, override_size, alpha) for path in matching_paths]
+
+    @staticmethod
+    def GetRotatedImage(image: pygame.Surface, angle: float) -> pygame.Surface:
+        """Return `image` rotated counter-clockwise by `angle` degrees (rounded to
+        ImageLoader.rotation_step). The result is shared, so it shouldn't be drawn on.
+        Images bigger than `max_shared_rotation_bytes` get a new copy every time instead."""
+
+        step = ImageLoader.rotation_step
+        angle = (round(angle / step) * step) % 360
+        if ImageLoader.GetImageBytes(image) > ImageLoader.max_shared_rotation_bytes:
+            ImageLoader.stats["rotated_unshared"] += 1
+            return pygame.transform.rotate(image, angle)
+
+        key = (image, angle)
+        rotated_image = ImageLoader.rotated_images_cache.get(key)
+        if rotated_image is not None:
+            ImageLoader.stats["rotated_hits"] += 1
+            ImageLoader.rotated_images_cache.move_to_end(key)
+            return rotated_image
+
+        ImageLoader.stats["rotated_misses"] += 1
+        rotated_image = pygame.transform.rotate(image, angle)
+        ImageLoader.rotated_images_cache[key] = rotated_image
+        ImageLoader.rotated_images_bytes += ImageLoader.GetImageBytes(rotated_image)
+        while ImageLoader.rotated_images_bytes > ImageLoader.max_rotated_bytes and len(ImageLoader.rotated_images_cache) > 1:
+            _, evicted_image = ImageLoader.rotated_images_cache.popitem(last=False)
+            ImageLoader.rotated_images_bytes -= ImageLoader.GetImageBytes(evicted_image)
+            ImageLoader.stats["rotated_evictions"] += 1
+
+        return rotated_image
+
+    @staticmethod
+    def GetImageBytes(image: pygame.Surface) -> int:
+        """Roughly how much memory the pixels of an image take up"""
+        return image.get_width() * image.get_height() * image.get_bytesize()
+
+    @staticmethod
+    def GetStats() -> dict[str, int]:
+        """How many images are resident in each cache, how much memory they take up,
+        and how often each cache had what was asked for"""
+
+        masks_bytes = sum(mask.get_size()[0] * mask.get_size()[1] // 8 for mask in ImageLoader.loaded_masks_cache.values())
+        return {
+            **ImageLoader.stats,
+            "images": len(ImageLoader.loaded_images_cache),
+            "images_bytes": ImageLoader.loaded_images_bytes,
+            "scaled": len(ImageLoader.scaled_images_cache),
+            "scaled_bytes": ImageLoader.scaled_images_bytes,
+            "rotated": len(ImageLoader.rotated_images_cache),
+            "rotated_bytes": ImageLoader.rotated_images_bytes,
+            "masks": len(ImageLoader.loaded_masks_cache),
+            "masks_bytes": masks_bytes,
+            "total_bytes": ImageLoader.loaded_images_bytes + ImageLoader.scaled_images_bytes + ImageLoader.rotated_images_bytes + masks_bytes,
+        }
+
+    @staticmethod
+    def ResetStats() -> None:
+        for name in ImageLoader.stats:
+            ImageLoader.stats[name] = 0
+
+    @staticmethod
+    def DumpStats(file=None, largest: int = 10) -> None:
+        """Print the stats and the `largest` resident images, to see what is actually taking up memory"""
+
+        stats = ImageLoader.GetStats()
+        print(f"ImageLoader: {stats['total_bytes'] / 2**20:.1f} MB resident", file=file)
+        for cache in ("images", "scaled", "rotated", "masks"):
+            print(f"  {cache:<8}{stats[cache]:>6} {stats[cache + '_bytes'] / 2**20:>8.1f} MB", file=file)
+        for cache, prefix in (("images", ""), ("scaled", "scaled_"), ("rotated", "rotated_")):
+            hits, misses = stats[prefix + "hits"], stats[prefix + "misses"]
+            print(f"  {cache:<8}{hits / max(1, hits + misses):>6.1%} hit rate ({hits} hits, {misses} misses)", file=file)
+        print(f"  {stats['rotated_unshared']} rotations of large images not cached", file=file)
+
+        resident = [(ImageLoader.GetImageBytes(image), path) for path, image in ImageLoader.loaded_images_cache.items()]
+        resident += [(ImageLoader.GetImageBytes(image), f"{path} at {size}") for (path, size), image in ImageLoader.scaled_images_cache.items()]
+        resident += [(ImageLoader.GetImageBytes(image), f"{original.get_size()} image rotated by {angle}")
+                     for (original, angle), image in ImageLoader.rotated_images_cache.items()]
+        for image_bytes, name in sorted(resident, reverse=True)[:largest]:
+            print(f"  {image_bytes / 1024:>8.0f} KB  {name}", file=file)
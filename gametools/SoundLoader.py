@@ -0,0 +1,26 @@
+import pygame
+
+class SoundLoader:
+    """Like ImageLoader, but for sounds. Makes sure each sound file is only decoded once."""
+
+    # Class variable to store the loaded sound for each unique path
+    loaded_sounds_cache: dict[str, pygame.mixer.Sound] = {}
+
+    @staticmethod
+    def GetSound(path: str) -> pygame.mixer.Sound:
+        """Given a path to a sound file, return the corresponding pygame.mixer.Sound,
+        decoding it if it hasn't been loaded before. The mixer has to be initialized first.
+
+        Will raise FileNotFoundError if file isn't found at given path"""
+
+        sound = SoundLoader.loaded_sounds_cache.get(path)
+        if sound is None:
+            sound = pygame.mixer.Sound(path)
+            SoundLoader.loaded_sounds_cache[path] = sound
+
+        return sound
+
+    @staticmethod
+    def AddDecodedSound(path: str, sound: pygame.mixer.Sound) -> None:
+        """Cache a sound that was decoded elsewhere (like on an AssetLoader thread)"""
+        SoundLoader.loaded_sounds_cache[path] = sound
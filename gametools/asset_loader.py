@@ -0,0 +1,79 @@
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable
+
+import pygame
+
+from gametools.ImageLoader import ImageLoader
+from gametools.SoundLoader import SoundLoader
+
+class AssetLoader:
+    """Loads assets on a pool of worker threads so the window doesn't freeze while they load.
+
+    Queue files up with `queue_image` and `queue_sound` (or any slow function
+    with `queue_task`), then call `poll` once a frame from the main thread.
+    Reading and decoding files happens on the workers, and anything that has
+    to happen on the main thread, like converting images to the display's
+    pixel format, is done in `poll`. Assets are handed over in the order they
+    were queued, so ImageLoader's cache ends up in the same order as if they
+    had been loaded one by one.
+    """
+
+    def __init__(self, max_workers: int = 4, on_progress: Callable[[int, int, str], None] | None = None):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="AssetLoader")
+        # (name, future, function to run on the main thread with the result)
+        self.pending: deque[tuple[str, Future, Callable[[Any], None] | None]] = deque()
+        self.queued_names = set()
+        self.total = 0
+        self.finished = 0
+        # Called with (finished, total, name) every time an asset is ready
+        self.on_progress = on_progress
+
+    def queue_task(self, name: str, load: Callable[[], Any], finish: Callable[[Any], None] | None = None) -> None:
+        """Run `load` on a worker, then `finish` with its result on the main thread"""
+        if name in self.queued_names:
+            return
+        self.queued_names.add(name)
+        self.pending.append((name, self.executor.submit(load), finish))
+        self.total += 1
+
+    def queue_image(self, path: str, alpha: bool = False) -> None:
+        if path in ImageLoader.loaded_images_cache:
+            return
+        self.queue_task(path, lambda: ImageLoader.LoadDecodedImage(path), lambda image: ImageLoader.AddDecodedImage(path, image, alpha))
+
+    def queue_sound(self, path: str) -> None:
+        """The mixer has to be initialized before sounds are queued"""
+        if path in SoundLoader.loaded_sounds_cache:
+            return
+        self.queue_task(path, lambda: pygame.mixer.Sound(path), lambda sound: SoundLoader.AddDecodedSound(path, sound))
+
+    def poll(self, time_budget: float = 1 / 120) -> bool:
+        """Hand over finished assets, spending at most about `time_budget` seconds doing it.
+        Returns True once everything has been loaded. Errors from the workers are raised here.
+        """
+        start = time.perf_counter()
+        while self.pending and self.pending[0][1].done():
+            name, future, finish = self.pending.popleft()
+            result = future.result()
+            if finish is not None:
+                finish(result)
+
+            self.finished += 1
+            if self.on_progress is not None:
+                self.on_progress(self.finished, self.total, name)
+            if time.perf_counter() - start > time_budget:
+                break
+
+        return self.is_done()
+
+    def shutdown(self) -> None:
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def is_done(self) -> bool:
+        return self.finished == self.total
+
+    def get_progress(self) -> float:
+        """How much has been loaded, from 0 to 1"""
+        return self.finished / self.total if self.total else 1.0
@@ -0,0 +1,108 @@
+"""Packing lots of small images (animation frames, props) into one big atlas image.
+
+An atlas is saved as `<name>.png` next to `<name>.json`, which holds where each
+source image ended up and the modification time and size of each source file,
+so a stale atlas can be spotted and rebuilt.
+
+Build one by hand with: python -m gametools.atlas <output name> <folder> [<folder> ...]
+"""
+
+import glob
+import json
+import os
+import sys
+
+import pygame
+
+ATLAS_VERSION = 1
+
+def source_paths(folders: list[str]) -> list[str]:
+    return sorted(path for folder in folders for path in glob.glob(os.path.join(folder, "*.png")))
+
+def source_signatures(paths: list[str]) -> dict[str, list[int]]:
+    signatures = {}
+    for path in paths:
+        stat = os.stat(path)
+        signatures[path] = [stat.st_mtime_ns, stat.st_size]
+    return signatures
+
+def read_atlas_index(atlas_path: str) -> dict | None:
+    """Return the index of an atlas, or None if it doesn't exist"""
+    try:
+        with open(atlas_path + ".json") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def is_atlas_current(folders: list[str], atlas_path: str) -> bool:
+    """Whether the atlas exists and was built from the current versions of the images in `folders`"""
+    index = read_atlas_index(atlas_path)
+    if index is None or index.get("version") != ATLAS_VERSION or not os.path.exists(atlas_path + ".png"):
+        return False
+    return index["sources"] == source_signatures(source_paths(folders))
+
+def pack(sizes: list[tuple[int, int]], width: int, padding: int = 1) -> tuple[list[tuple[int, int]], int]:
+    """Place rectangles of the given sizes in rows (tallest first) in an area `width` px wide.
+    Returns the top left of each rectangle and the height that was needed."""
+
+    positions = [(0, 0)] * len(sizes)
+    x = y = row_height = 0
+    for idx in sorted(range(len(sizes)), key=lambda idx: sizes[idx][1], reverse=True):
+        w, h = sizes[idx]
+        if x + w > width and x > 0:
+            x = 0
+            y += row_height + padding
+            row_height = 0
+        positions[idx] = (x, y)
+        x += w + padding
+        row_height = max(row_height, h)
+
+    return positions, y + row_height
+
+def load_rgba(path: str) -> pygame.Surface:
+    """Load an image with per pixel alpha, the way convert_alpha() would turn it out
+    but without needing the display, so it can happen on another thread"""
+
+    image = pygame.image.load(path)
+    rgba_image = pygame.Surface(image.get_size(), pygame.SRCALPHA)
+    rgba_image.fill((0, 0, 0, 0))
+    if image.get_flags() & pygame.SRCALPHA:
+        # Copy the pixels as they are rather than blending them onto the transparent surface
+        rgba_image.blit(image, (0, 0), special_flags=pygame.BLEND_RGBA_MAX)
+    else:
+        # Pixels of the colorkey are skipped and stay transparent, the rest are copied as opaque
+        rgba_image.blit(image, (0, 0))
+    return rgba_image
+
+def build_atlas(folders: list[str], atlas_path: str, width: int = 512) -> dict:
+    """Pack every PNG in `folders` into an atlas and save it, returning its index.
+    Doesn't need the display, so it can run on an AssetLoader thread."""
+
+    paths = source_paths(folders)
+    images = [load_rgba(path) for path in paths]
+    width = max([width] + [image.get_width() for image in images])
+    positions, height = pack([image.get_size() for image in images], width)
+
+    atlas_image = pygame.Surface((width, max(1, height)), pygame.SRCALPHA)
+    atlas_image.fill((0, 0, 0, 0))
+    frames = {}
+    for path, image, position in zip(paths, images, positions):
+        # Copy the pixels as they are rather than blending them onto the transparent atlas
+        atlas_image.blit(image, position, special_flags=pygame.BLEND_RGBA_MAX)
+        frames[path] = [*position, *image.get_size()]
+
+    index = {"version": ATLAS_VERSION, "sources": source_signatures(paths), "frames": frames}
+    os.makedirs(os.path.dirname(atlas_path) or ".", exist_ok=True)
+    pygame.image.save(atlas_image, atlas_path + ".png")
+    with open(atlas_path + ".json", 'w') as f:
+        json.dump(index, f, indent=1)
+
+    return index
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print("Usage: python -m gametools.atlas <output name> <folder> [<folder> ...]")
+        sys.exit(1)
+
+    index = build_atlas(sys.argv[2:], sys.argv[1])
+    print(f"Packed {len(index['frames'])} images into {sys.argv[1]}.png")
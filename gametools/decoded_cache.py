@@ -0,0 +1,143 @@
+import mmap
+import os
+import struct
+
+import numpy as np
+import pygame
+
+class DecodedCache:
+    """Saves decoded images and masks to disk as raw bytes, so the next time the game
+    starts they can be read straight back instead of being decoded (and thresholded)
+    from their PNGs again.
+
+    Every file starts with a header holding the modification time and size of the
+    source file, and is ignored (and rewritten) once the source changes.
+
+        header: magic (4 bytes), version (u16), pixel format (4 bytes), width (u32),
+                height (u32), source mtime (i64), source size (i64)
+    """
+
+    MAGIC = b"GTDC"
+    VERSION = 1
+    HEADER = struct.Struct("<4sH4sIIqq")
+    # The pixel format of masks. They are saved a row at a time with 8 pixels to a byte, first pixel in
+    # the highest bit, rather than as the Mask's own buffer, whose layout depends on the pygame build.
+    MASK_FORMAT = b"BITS"
+    # Masks are converted to and from bits this many rows at a time, to keep the surfaces in between small
+    MASK_BAND_ROWS = 256
+
+    def __init__(self, cache_root: str = "assets/cache/decoded"):
+        self.cache_root = cache_root
+
+    def cache_path(self, path: str, suffix: str) -> str:
+        name = os.path.normpath(path).replace(os.sep, "_")
+        return os.path.join(self.cache_root, f"{name}.{suffix}")
+
+    def load_image(self, path: str) -> pygame.Surface | None:
+        """Return the decoded image cached for the file at `path`, or None if there isn't an up to date one"""
+        with self.open_cache(path, "pixels") as (pixel_format, size, pixels):
+            if pixels is None or len(pixels) != size[0] * size[1] * len(pixel_format):
+                return None
+            # frombuffer doesn't copy the pixels, they need to be copied before the file is closed
+            image = pygame.image.frombuffer(pixels, size, pixel_format.decode())
+            decoded_image = image.copy()
+            del image
+            return decoded_image
+
+    def save_image(self, path: str, image: pygame.Surface) -> None:
+        """Images with a palette or colorkey aren't cached, raw RGB(A) pixels can't stand in for them
+        exactly when they are converted. They're usually small and quick to decode anyway."""
+        if image.get_bytesize() == 1 or image.get_colorkey() is not None:
+            return
+        pixel_format = "RGBA" if image.get_flags() & pygame.SRCALPHA else "RGB"
+        self.write_cache(path, "pixels", pixel_format.encode(), image.get_size(), pygame.image.tobytes(image, pixel_format))
+
+    def load_mask(self, path: str, key: str) -> pygame.mask.Mask | None:
+        """Return the mask cached for the file at `path`, `key` should tell apart different masks made from the same file"""
+        with self.open_cache(path, f"{key}.mask") as (pixel_format, size, bits):
+            if bits is None or pixel_format != DecodedCache.MASK_FORMAT:
+                return None
+            width, height = size
+            row_bytes = (width + 7) // 8
+            if len(bits) != row_bytes * height:
+                return None
+
+            rows = np.frombuffer(bits, dtype=np.uint8).reshape(height, row_bytes)
+            mask = pygame.mask.Mask(size)
+            for top in range(0, height, DecodedCache.MASK_BAND_ROWS):
+                # from_surface sets every pixel that isn't the colorkey
+                band = np.unpackbits(rows[top:top + DecodedCache.MASK_BAND_ROWS], axis=1, count=width).T
+                band_surface = pygame.Surface(band.shape, depth=8)
+                pygame.surfarray.blit_array(band_surface, band)
+                band_surface.set_colorkey(0)
+                mask.draw(pygame.mask.from_surface(band_surface), (0, top))
+            del rows
+            return mask
+
+    def save_mask(self, path: str, key: str, mask: pygame.mask.Mask) -> None:
+        width, height = mask.get_size()
+        band_mask = pygame.mask.Mask((width, DecodedCache.MASK_BAND_ROWS))
+        band_surface = pygame.Surface(band_mask.get_size(), depth=32)
+        unset = band_surface.map_rgb((0, 0, 0))
+        bands = []
+        for top in range(0, height, DecodedCache.MASK_BAND_ROWS):
+            band_mask.clear()
+            band_mask.draw(mask, (0, -top))
+            band_mask.to_surface(band_surface, setcolor=(255, 255, 255), unsetcolor=(0, 0, 0))
+            pixels = pygame.surfarray.pixels2d(band_surface)
+            rows = min(DecodedCache.MASK_BAND_ROWS, height - top)
+            bands.append(np.packbits(pixels[:, :rows].T != unset, axis=1))
+            del pixels
+        self.write_cache(path, f"{key}.mask", DecodedCache.MASK_FORMAT, mask.get_size(), np.concatenate(bands).tobytes())
+
+    def source_signature(self, path: str) -> tuple[int, int]:
+        stat = os.stat(path)
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def write_cache(self, path: str, suffix: str, pixel_format: bytes, size: tuple[int, int], data) -> None:
+        os.makedirs(self.cache_root, exist_ok=True)
+        cache_path = self.cache_path(path, suffix)
+        # Write to a temporary file first so a half written cache is never read
+        with open(cache_path + ".tmp", 'wb') as f:
+            f.write(DecodedCache.HEADER.pack(DecodedCache.MAGIC, DecodedCache.VERSION, pixel_format, *size, *self.source_signature(path)))
+            f.write(data)
+        os.replace(cache_path + ".tmp", cache_path)
+
+    def open_cache(self, path: str, suffix: str) -> "CacheFile":
+        return CacheFile(self.cache_path(path, suffix), self.source_signature(path))
+
+class CacheFile:
+    """Memory maps a cache file for a with block, giving (pixel format, size, data) or
+    (None, None, None) if the file is missing or out of date. The data can only be used
+    inside the with block."""
+
+    def __init__(self, cache_path: str, signature: tuple[int, int]):
+        self.cache_path = cache_path
+        self.signature = signature
+        self.file = None
+        self.data = None
+        self.view = None
+
+    def __enter__(self):
+        try:
+            self.file = open(self.cache_path, 'rb')
+            self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return (None, None, None)
+
+        if len(self.data) < DecodedCache.HEADER.size:
+            return (None, None, None)
+        magic, version, pixel_format, width, height, mtime, size = DecodedCache.HEADER.unpack_from(self.data, 0)
+        if magic != DecodedCache.MAGIC or version != DecodedCache.VERSION or (mtime, size) != self.signature:
+            return (None, None, None)
+
+        self.view = memoryview(self.data)[DecodedCache.HEADER.size:]
+        return (pixel_format.rstrip(b"\0"), (width, height), self.view)
+
+    def __exit__(self, *exc_info):
+        if self.view is not None:
+            self.view.release()
+        if self.data is not None:
+            self.data.close()
+        if self.file is not None:
+            self.file.close()
@@ -0,0 +1,75 @@
+import pygame
+
+class DirtyRects:
+    """Keeps track of which parts of the screen changed since the last frame, so only
+    those have to be redrawn and pushed to the display with pygame.display.update(rects).
+
+    Every frame, `track` each sprite that is drawn with where it is drawn and `add`
+    any other area that changed, then `finish` gives the areas to redraw. A sprite
+    that moved, changed its image or wasn't drawn this time marks both where it was
+    and where it is now as dirty. Call `invalidate` when everything has to be
+    redrawn, like when the camera moves.
+    """
+
+    def __init__(self, screen_rect: pygame.Rect, full_redraw_ratio: float = 0.6):
+        self.screen_rect = pygame.Rect(screen_rect)
+        # Past this much of the screen it's quicker to redraw it all in one go than piece by piece
+        self.full_redraw_ratio = full_redraw_ratio
+
+        # Sprite -> (image, image alpha, screen rect) for what was drawn last frame, and so far this frame
+        self.drawn: dict[object, tuple[pygame.Surface, int | None, tuple[int, int, int, int]]] = {}
+        self.current: dict[object, tuple[pygame.Surface, int | None, tuple[int, int, int, int]]] = {}
+        self.rects: list[pygame.Rect] = []
+        self.full_redraw = True
+
+    def invalidate(self) -> None:
+        self.full_redraw = True
+
+    def add(self, rect: pygame.Rect) -> None:
+        rect = self.screen_rect.clip(rect)
+        if rect.width > 0 and rect.height > 0:
+            self.rects.append(rect)
+
+    def track(self, sprite, image: pygame.Surface, rect: pygame.Rect) -> None:
+        """`sprite` is drawn with `image` at `rect` on the screen this frame"""
+        state = (image, image.get_alpha(), tuple(rect))
+        self.current[sprite] = state
+        if self.full_redraw:
+            return
+
+        last_state = self.drawn.get(sprite)
+        if last_state != state:
+            self.add(rect)
+            if last_state is not None:
+                self.add(pygame.Rect(last_state[2]))
+
+    def finish(self) -> list[pygame.Rect]:
+        """Return the areas of the screen that need to be redrawn this frame, and start on the next one"""
+        if not self.full_redraw:
+            # Sprites that aren't drawn anymore leave a hole where they were
+            for sprite, state in self.drawn.items():
+                if sprite not in self.current:
+                    self.add(pygame.Rect(state[2]))
+
+        self.drawn = self.current
+        self.current = {}
+        rects = merge_rects(self.rects)
+        self.rects = []
+
+        covered = sum(rect.width * rect.height for rect in rects)
+        if self.full_redraw or covered > self.screen_rect.width * self.screen_rect.height * self.full_redraw_ratio:
+            self.full_redraw = False
+            return [self.screen_rect.copy()]
+        return rects
+
+def merge_rects(rects: list[pygame.Rect]) -> list[pygame.Rect]:
+    """Join overlapping rects together until none of them overlap, so no pixel is drawn twice"""
+    merged = []
+    for rect in rects:
+        rect = rect.copy()
+        idx = rect.collidelist(merged)
+        while idx != -1:
+            rect.union_ip(merged.pop(idx))
+            idx = rect.collidelist(merged)
+        merged.append(rect)
+    return merged
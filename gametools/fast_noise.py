@@ -0,0 +1,109 @@
+"""NumPy versions of the functions in gametools.noise.
+
+Rather than being called once per pixel, these take whole grids of x and y
+coordinates as arrays and return an array of results, which makes
+generating a texture take milliseconds instead of seconds. They follow
+the per-pixel functions step by step so the results match them.
+"""
+
+import random
+
+import numpy as np
+import pygame
+
+from gametools.noise import lerp, quintic_interpolation
+
+def coordinate_grid(size: tuple[int, int]) -> tuple[np.ndarray, np.ndarray]:
+    """Return the x and y pixel coordinates of a surface of the given size.
+    The arrays are indexed [x, y] to match pygame.surfarray.
+    """
+    return np.meshgrid(np.arange(size[0], dtype=np.float64), np.arange(size[1], dtype=np.float64), indexing='ij')
+
+def random1(x: np.ndarray, y: np.ndarray, seed_vec=pygame.Vector2(12.9898,78.233)) -> np.ndarray:
+    intermediate = np.sin(x * seed_vec.x + y * seed_vec.y) * 43758.5453123
+    return np.mod(intermediate, 1.0)
+
+def random2(x: np.ndarray, y: np.ndarray, seed_vec1=pygame.Vector2(127.1,311.7), seed_vec2=pygame.Vector2(269.5,183.3)) -> tuple[np.ndarray, np.ndarray]:
+    intermediate_x = np.sin(x * seed_vec1.x + y * seed_vec1.y) * 43758.5453
+    intermediate_y = np.sin(x * seed_vec2.x + y * seed_vec2.y) * 43758.5453
+    return np.mod(intermediate_x, 1.0), np.mod(intermediate_y, 1.0)
+
+def smooth_noise(x: np.ndarray, y: np.ndarray, interpolation_method=quintic_interpolation, seed_vec=pygame.Vector2(12.9898,78.233)) -> np.ndarray:
+    """Batched version of noise.smooth_noise"""
+    i_x = np.floor(x)
+    i_y = np.floor(y)
+    f_x = x - i_x
+    f_y = y - i_y
+
+    topleft     = random1(i_x, i_y, seed_vec)
+    topright    = random1(i_x + 1.0, i_y, seed_vec)
+    bottomleft  = random1(i_x, i_y + 1.0, seed_vec)
+    bottomright = random1(i_x + 1.0, i_y + 1.0, seed_vec)
+
+    u_x = interpolation_method(0.0, 1.0, f_x)
+    u_y = interpolation_method(0.0, 1.0, f_y)
+
+    f_xy1 = lerp(topleft, topright, u_x)
+    f_xy2 = lerp(bottomleft, bottomright, u_x)
+    return lerp(f_xy1, f_xy2, u_y)
+
+def fBm_noise(x: np.ndarray, y: np.ndarray, octaves: int, amplitude: float = 0.5, frequency: float = 1.0, lacunarity: float = 2.0, gain: float = 0.5, **smooth_noise_kwargs) -> np.ndarray:
+    """Batched version of noise.fBm_noise"""
+    value = np.zeros(np.shape(x))
+    for _ in range(octaves):
+        value += amplitude * smooth_noise(x * frequency, y * frequency, **smooth_noise_kwargs)
+        frequency *= lacunarity
+        amplitude *= gain
+
+    return value
+
+def worley_noise(x: np.ndarray, y: np.ndarray, rows: int = 4, cols: int = 4, seed_vec1=pygame.Vector2(127.1,311.7), seed_vec2=pygame.Vector2(269.5,183.3)) -> np.ndarray:
+    """Batched version of noise.worley_noise. The squared distances to the points in the
+    9 surrounding cells are returned sorted along the first axis, so result[0] holds
+    the closest distance for every coordinate.
+    """
+
+    x = x * cols
+    y = y * rows
+    i_x = np.floor(x)
+    i_y = np.floor(y)
+    f_x = x - i_x
+    f_y = y - i_y
+
+    dists = []
+    for cell_x in range(-1, 2):
+        for cell_y in range(-1, 2):
+            r_x, r_y = random2(i_x + cell_x, i_y + cell_y, seed_vec1, seed_vec2)
+            diff_x = cell_x + r_x - f_x
+            diff_y = cell_y + r_y - f_y
+            dists.append(diff_x * diff_x + diff_y * diff_y)
+
+    return np.sort(np.stack(dists), axis=0)
+
+def worley_noise_val(dists: np.ndarray, coefficients: list[float]) -> np.ndarray:
+    """Batched version of noise.worley_noise_val"""
+    v = np.zeros(dists.shape[1:])
+    for Dn, Cn in zip(dists, coefficients):
+        v += Dn * Cn
+    return v
+
+def values_to_surface(values: np.ndarray) -> pygame.Surface:
+    """Turn an array of values between 0 and 1 into a greyscale Surface"""
+    cols = np.minimum(255, (values * 255).astype(np.int32)).astype(np.uint8)
+    surf = pygame.Surface(values.shape)
+    pygame.surfarray.blit_array(surf, np.repeat(cols[:, :, np.newaxis], 3, axis=2))
+    return surf
+
+def fBm_texture(size=(256, 256), octaves=5, **kwargs) -> pygame.Surface:
+    x, y = coordinate_grid(size)
+    return values_to_surface(fBm_noise(x / size[0], y / size[1], octaves, **kwargs))
+
+def worley_texture(size=(256, 256), rows=16, cols=16, seed_vec1=pygame.Vector2(127.1,311.7), seed_vec2=pygame.Vector2(269.5,183.3)) -> pygame.Surface:
+    x, y = coordinate_grid(size)
+    dists = worley_noise((x / size[0] - 0.5) * 8.0, (y / size[1] - 0.5) * 8.0, rows, cols, seed_vec1, seed_vec2)
+    return values_to_surface(dists[1] - dists[0])
+
+def random_worley_texture(size=(256, 256), rows=4, cols=4) -> pygame.Surface:
+    worley_vec1 = pygame.Vector2(random.uniform(-1000, 1000), random.uniform(-1000, 1000))
+    worley_vec2 = pygame.Vector2(random.uniform(-1000, 1000), random.uniform(-1000, 1000))
+    return worley_texture(size, rows, cols, worley_vec1, worley_vec2)
@@ -0,0 +1,99 @@
+import time
+
+import pygame
+
+class FramePacer:
+    """Runs the simulation at a fixed rate no matter how fast frames are drawn.
+
+    The time that passes between frames is collected and handed out in
+    steps of exactly `step` seconds, so a slow frame means a few more steps
+    instead of one huge one that could move things straight through walls.
+    Whatever is left over is kept for the next frame, and `alpha` says how
+    far the drawn frame is between the last two steps, so positions can be
+    interpolated for smooth movement.
+
+    The frame rate it aims for follows how long frames take to make, so a
+    slow machine settles on a rate it can keep up instead of stuttering.
+    When even `min_fps` can't be kept up, drawing is skipped now and then
+    (at most `max_skipped_frames` in a row) to let the simulation catch up.
+
+        pacer = FramePacer()
+        while running:
+            elapsed = pacer.tick(clock)
+            for _ in range(pacer.advance(elapsed)):
+                world.update(pacer.step)
+            if pacer.should_draw():
+                world.draw(screen, pacer.alpha)
+            pygame.display.update()
+            pacer.frame_done()
+    """
+
+    def __init__(self, step: float = 1 / 120, max_fps: int = 144, min_fps: int = 30,
+                 max_steps: int = 5, max_skipped_frames: int = 2, headroom: float = 1.25):
+        self.step = step
+        self.max_fps = max_fps
+        self.min_fps = min_fps
+        # More steps than this in one frame and the lost time is dropped, the game slows down
+        # rather than falling further and further behind
+        self.max_steps = max_steps
+        self.max_skipped_frames = max_skipped_frames
+        # How much spare time to leave in each frame when picking the frame rate
+        self.headroom = headroom
+
+        self.target_fps = max_fps
+        self.accumulator = 0.0
+        self.alpha = 1.0
+
+        # Running average of how many seconds a frame takes to make, not counting waiting in tick()
+        self.frame_cost = 0.0
+        self.frame_start = None
+        self.skipped_frames = 0
+        self.dropped_time = 0.0
+
+    def tick(self, clock: pygame.time.Clock) -> float:
+        """Wait until it's time for the next frame, returns the seconds since the last one"""
+        elapsed = clock.tick(self.target_fps) / 1000.0
+        self.frame_start = time.perf_counter()
+        return elapsed
+
+    def advance(self, elapsed: float) -> int:
+        """Add `elapsed` seconds, returns how many steps to simulate this frame"""
+        self.accumulator += elapsed
+        steps = int(self.accumulator // self.step)
+        if steps > self.max_steps:
+            self.dropped_time += (steps - self.max_steps) * self.step
+            self.accumulator -= (steps - self.max_steps) * self.step
+            steps = self.max_steps
+        self.accumulator -= steps * self.step
+        self.alpha = min(1.0, self.accumulator / self.step)
+        return steps
+
+    def is_overloaded(self) -> bool:
+        return self.frame_cost > 1 / self.min_fps
+
+    def should_draw(self) -> bool:
+        """Whether to draw this frame, see the class' description"""
+        if self.is_overloaded() and self.skipped_frames < self.max_skipped_frames:
+            self.skipped_frames += 1
+            return False
+        self.skipped_frames = 0
+        return True
+
+    def frame_done(self) -> None:
+        """Call once the frame is on the screen to measure how long it took and adjust the frame rate"""
+        if self.frame_start is None:
+            return
+        cost = time.perf_counter() - self.frame_start
+        self.frame_cost = cost if self.frame_cost == 0 else self.frame_cost * 0.9 + cost * 0.1
+
+        sustainable_fps = 1 / max(self.frame_cost * self.headroom, 1e-6)
+        target_fps = int(max(self.min_fps, min(self.max_fps, sustainable_fps)))
+        # Only bother changing it for big differences so it doesn't wobble every frame
+        if abs(target_fps - self.target_fps) > self.target_fps * 0.1:
+            self.target_fps = target_fps
+
+    def reset(self) -> None:
+        """Forget the time collected so far, like after a loading screen"""
+        self.accumulator = 0.0
+        self.alpha = 1.0
+        self.skipped_frames = 0
@@ -0,0 +1,104 @@
+import itertools
+from collections import deque
+from typing import Callable
+
+import pygame
+
+from gametools.profiling import PhaseTimer
+
+class PerfHUD:
+    """An overlay in the corner of the screen with the frame rate, a graph of the last
+    few hundred frame times and how long each phase of the frame took (from a PhaseTimer).
+
+    The text is only rendered again every `refresh_interval` seconds, both so it can
+    be read and so the HUD doesn't slow down the frames it's measuring. Anything else
+    worth showing can be added with `get_lines`, which is only called on refreshes.
+    """
+
+    # Frame times in the graph go from 0 to this many seconds
+    GRAPH_MAX = 1 / 20
+    BACKGROUND_COLOR = (0, 0, 0)
+    TEXT_COLOR = (220, 220, 220)
+
+    def __init__(self, timer: PhaseTimer, font: pygame.font.Font, get_lines: Callable[[], list[str]] | None = None,
+                 refresh_interval: float = 0.25, graph_size: tuple[int, int] = (240, 60)):
+        self.timer = timer
+        self.font = font
+        self.get_lines = get_lines
+        self.refresh_interval = refresh_interval
+        self.graph_size = graph_size
+        self.visible = False
+
+        self.frame_times: deque[float] = deque(maxlen=graph_size[0])
+        self.frames_since_refresh = 0
+        self.time_since_refresh = refresh_interval
+        self.text_images: list[pygame.Surface] = []
+        # Only ever grows while the HUD is up, so it always covers everything it drew before
+        self.size = (0, 0)
+
+    def toggle(self) -> None:
+        self.visible = not self.visible
+        self.time_since_refresh = self.refresh_interval
+        self.size = (0, 0)
+
+    def add_frame(self, seconds: float) -> None:
+        """Call once a frame with how long it has been since the last one"""
+        self.frame_times.append(seconds)
+        self.frames_since_refresh += 1
+        self.time_since_refresh += seconds
+
+    def phase_lines(self, frames: int) -> list[str]:
+        """The mean time of each phase over the last `frames` frames"""
+        lines = []
+        for name, samples in self.timer.history.items():
+            recent = list(itertools.islice(reversed(samples), max(1, frames)))
+            lines.append(f"{name:<14}{sum(recent) / len(recent) * 1000:>7.2f} ms")
+        return lines
+
+    def refresh(self) -> None:
+        frames = self.frames_since_refresh
+        recent = list(itertools.islice(reversed(self.frame_times), max(1, frames)))
+        frame_time = sum(recent) / len(recent) if recent else 0
+        fps = 1 / frame_time if frame_time > 0 else 0
+
+        lines = [f"{fps:.0f} fps  {frame_time * 1000:.2f} ms/frame", *self.phase_lines(frames)]
+        if self.get_lines is not None:
+            lines += self.get_lines()
+        self.text_images = [self.font.render(line, True, PerfHUD.TEXT_COLOR) for line in lines]
+
+        self.frames_since_refresh = 0
+        self.time_since_refresh = 0
+
+    def draw(self, surface: pygame.Surface, topleft: tuple[int, int] = (8, 8)) -> pygame.Rect | None:
+        """Draw the HUD if it's visible, returning the area it covers"""
+        if not self.visible:
+            return None
+        if self.time_since_refresh >= self.refresh_interval:
+            self.refresh()
+
+        padding = 6
+        graph_width, graph_height = self.graph_size
+        line_height = self.font.get_linesize()
+        width = max([graph_width] + [image.get_width() for image in self.text_images]) + padding * 2
+        height = graph_height + line_height * len(self.text_images) + padding * 3
+        self.size = (max(self.size[0], width), max(self.size[1], height))
+        area = pygame.Rect(topleft, self.size)
+        # Solid so nothing underneath shows through, the dirty rect renderer doesn't redraw under it
+        surface.fill(PerfHUD.BACKGROUND_COLOR, area)
+
+        # Frame time graph, with lines at 60 and 30 fps
+        graph = pygame.Rect(area.left + padding, area.top + padding, graph_width, graph_height)
+        for x, seconds in enumerate(self.frame_times):
+            bar_height = min(graph_height, round(seconds / PerfHUD.GRAPH_MAX * graph_height))
+            color = (90, 200, 90) if seconds <= 1 / 60 else (220, 200, 60) if seconds <= 1 / 30 else (220, 70, 60)
+            surface.fill(color, (graph.left + x, graph.bottom - bar_height, 1, bar_height))
+        for fps in (60, 30):
+            y = graph.bottom - round(1 / fps / PerfHUD.GRAPH_MAX * graph_height)
+            pygame.draw.line(surface, (100, 100, 100), (graph.left, y), (graph.right - 1, y))
+
+        y = graph.bottom + padding
+        for image in self.text_images:
+            surface.blit(image, (area.left + padding, y))
+            y += line_height
+
+        return area
@@ -0,0 +1,98 @@
+import cProfile
+import io
+import os
+import pstats
+import time
+from collections import deque
+from contextlib import contextmanager
+
+class PhaseTimer:
+    """Measures how long each phase of a frame (update, drawing, ...) takes.
+
+    Wrap the code for a phase in `with timer.phase("name"):`, and call
+    `end_frame` once per frame to move this frame's timings into the history.
+    """
+
+    def __init__(self, history_length: int = 600):
+        self.history_length = history_length
+        # Seconds spent in each phase so far this frame
+        self.current: dict[str, float] = {}
+        # Seconds spent in each phase in the last `history_length` frames
+        self.history: dict[str, deque[float]] = {}
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.current[name] = self.current.get(name, 0.0) + time.perf_counter() - start
+
+    def end_frame(self) -> None:
+        for name, seconds in self.current.items():
+            if name not in self.history:
+                self.history[name] = deque(maxlen=self.history_length)
+            self.history[name].append(seconds)
+        self.current = {}
+
+    def reset(self) -> None:
+        self.current = {}
+        self.history = {}
+
+    def summary(self) -> dict[str, tuple[float, float, float]]:
+        """Return the (mean, 95th percentile, max) time of each phase in milliseconds"""
+        results = {}
+        for name, samples in self.history.items():
+            ordered = sorted(samples)
+            mean = sum(ordered) / len(ordered)
+            p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+            results[name] = (mean * 1000, p95 * 1000, ordered[-1] * 1000)
+        return results
+
+class FrameProfiler:
+    """Runs cProfile over the next few frames and saves the results, for finding out
+    what a slow frame is actually spending its time on.
+
+    Call `start` to begin (say from a hotkey) and `end_frame` once per frame. Once
+    enough frames have gone by the profile is saved to `<path>.prof`, which can be
+    opened with pstats or snakeviz, along with the slowest functions in `<path>.txt`.
+    """
+
+    def __init__(self, output_dir: str = "profiles"):
+        self.output_dir = output_dir
+        self.profile = None
+        self.frames_left = 0
+        self.path = None
+        # Where the last profile was saved
+        self.last_path = None
+
+    def is_running(self) -> bool:
+        return self.profile is not None
+
+    def start(self, frames: int = 120) -> None:
+        if self.profile is not None:
+            return
+        os.makedirs(self.output_dir, exist_ok=True)
+        self.path = os.path.join(self.output_dir, time.strftime("frames_%Y%m%d_%H%M%S"))
+        self.frames_left = frames
+        self.profile = cProfile.Profile()
+        self.profile.enable()
+
+    def end_frame(self) -> None:
+        if self.profile is None:
+            return
+        self.frames_left -= 1
+        if self.frames_left <= 0:
+            self.stop()
+
+    def stop(self) -> None:
+        self.profile.disable()
+        self.profile.dump_stats(self.path + ".prof")
+
+        report = io.StringIO()
+        pstats.Stats(self.profile, stream=report).sort_stats(pstats.SortKey.CUMULATIVE).print_stats(40)
+        with open(self.path + ".txt", 'w') as f:
+            f.write(report.getvalue())
+
+        self.last_path = self.path
+        self.profile = None
@@ -0,0 +1,104 @@
+import glob
+import os
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import pygame
+
+from gametools.SoundLoader import SoundLoader
+
+class SoundManager:
+    """Plays sounds by name (the file name without its extension) from a folder of sound files,
+    without decoding all of them up front.
+
+    Every sound falls into one of three groups, decided by the start of its name:
+    - `resident` sounds are short effects that need to play right away, they are decoded
+      once and kept (in SoundLoader's cache).
+    - `streamed` sounds are long clips that would take megabytes once decoded, they are
+      played straight from the file through pygame.mixer.music, one at a time.
+    - Everything else is decoded on a background thread the first time it's asked for
+      (or `preload`ed), and kept from then on.
+    """
+
+    # Decoding happens on one thread shared by every SoundManager, path -> sound being decoded
+    executor = None
+    decoding: dict[str, Future] = {}
+
+    @staticmethod
+    def InitMixer() -> None:
+        """Initialize the mixer if it hasn't been yet, doing it again would reset every channel"""
+        if pygame.mixer.get_init() is None:
+            pygame.mixer.init()
+
+    def __init__(self, sound_dir: str = "assets/sound", resident: tuple[str, ...] = (), streamed: tuple[str, ...] = ()):
+        SoundManager.InitMixer()
+        self.paths = {os.path.splitext(os.path.basename(path))[0]: path for path in sorted(glob.glob(os.path.join(sound_dir, "*.ogg")))}
+        self.resident = resident
+        self.streamed = streamed
+
+        for name in self.names():
+            if self.is_resident(name):
+                SoundLoader.GetSound(self.paths[name])
+
+    def names(self, part: str = "") -> list[str]:
+        """The names of every sound containing `part`"""
+        return [name for name in self.paths if part in name]
+
+    def is_resident(self, name: str) -> bool:
+        return name.startswith(self.resident)
+
+    def is_streamed(self, name: str) -> bool:
+        return name.startswith(self.streamed) and not self.is_resident(name)
+
+    def preload(self, names: list[str]) -> None:
+        """Start decoding sounds in the background so they're ready by the time they're played"""
+        for name in names:
+            if not self.is_streamed(name):
+                self.get_sound(name)
+
+    def get_sound(self, name: str) -> pygame.mixer.Sound | None:
+        """Return the decoded sound, or None if it's still being decoded (which is started if it isn't yet)"""
+        path = self.paths[name]
+        sound = SoundLoader.loaded_sounds_cache.get(path)
+        if sound is not None:
+            return sound
+
+        future = SoundManager.decoding.get(path)
+        if future is None:
+            if SoundManager.executor is None:
+                SoundManager.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="SoundManager")
+            SoundManager.decoding[path] = SoundManager.executor.submit(pygame.mixer.Sound, path)
+            return None
+        if not future.done():
+            return None
+
+        del SoundManager.decoding[path]
+        sound = future.result()
+        SoundLoader.AddDecodedSound(path, sound)
+        return sound
+
+    def play(self, name: str, volume: float = 1.0) -> pygame.mixer.Channel | None:
+        """Play a sound, returns the channel it's playing on if it's a decoded sound. Streamed sounds
+        replace whatever was streaming before. Sounds that aren't decoded yet are skipped this time."""
+        if self.is_streamed(name):
+            self.play_stream(name, volume)
+            return None
+
+        sound = self.get_sound(name)
+        if sound is None:
+            return None
+        channel = sound.play()
+        if channel is not None:
+            channel.set_volume(volume)
+        return channel
+
+    def play_stream(self, name: str, volume: float = 1.0) -> None:
+        pygame.mixer.music.load(self.paths[name])
+        pygame.mixer.music.set_volume(volume)
+        pygame.mixer.music.play()
+
+    def get_memory(self) -> int:
+        """Roughly how many bytes the decoded sounds from this folder take up"""
+        frequency, size, channels = pygame.mixer.get_init()
+        bytes_per_second = frequency * channels * abs(size) // 8
+        return int(sum(SoundLoader.loaded_sounds_cache[path].get_length() * bytes_per_second
+                       for path in self.paths.values() if path in SoundLoader.loaded_sounds_cache))
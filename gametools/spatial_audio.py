@@ -0,0 +1,123 @@
+import numpy as np
+import pygame
+
+class Voice:
+    """A sound playing on one of SpatialAudio's channels"""
+
+    def __init__(self, channel: pygame.mixer.Channel, source, priority: float):
+        self.channel = channel
+        # Something with a `position`, or None for sounds that aren't in the world (like the player's own)
+        self.source = source
+        self.priority = priority
+        # How loud it is right now, from 0 to 1
+        self.volume = 1.0
+
+    def is_playing(self) -> bool:
+        return self.channel.get_busy()
+
+    def get_audibility(self) -> float:
+        """How much it matters that this keeps playing, quiet and unimportant sounds are the first to go"""
+        return self.priority * self.volume
+
+class SpatialAudio:
+    """Plays sounds that come from somewhere in the world, so they get quieter with distance
+    and pan left and right with where they are from the listener.
+
+    Only `max_voices` sounds can play at once, on channels reserved for them. When they
+    are all taken a new sound replaces the least audible one (priority times volume), or
+    is skipped if it wouldn't be any more audible itself. Volumes and panning aren't
+    worked out every frame, but for every voice at once `update_rate` times a second.
+    """
+
+    def __init__(self, max_voices: int = 6, hearing_radius: float = 900, update_rate: float = 10):
+        self.max_voices = max_voices
+        self.hearing_radius = hearing_radius
+        self.update_interval = 1 / update_rate
+        self.update_timer = 0.0
+
+        # Keep some channels free for sounds played the normal way
+        if pygame.mixer.get_num_channels() < max_voices + 4:
+            pygame.mixer.set_num_channels(max_voices + 4)
+        pygame.mixer.set_reserved(max_voices)
+        self.channels = [pygame.mixer.Channel(idx) for idx in range(max_voices)]
+        self.voices: list[Voice] = []
+
+        self.listener = pygame.Vector2()
+        # How many sounds were skipped or cut off because there weren't any voices left
+        self.skipped_count = 0
+        self.stolen_count = 0
+
+    def attenuate(self, offsets: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """The (left, right) volume of sounds at each of the (N, 2) `offsets` from the listener"""
+        distances = np.hypot(offsets[:, 0], offsets[:, 1])
+        volumes = np.clip(1 - distances / self.hearing_radius, 0, 1) ** 2
+        # Fully to one side once a sound is half the hearing radius to the left or right
+        pans = np.clip(offsets[:, 0] / (self.hearing_radius / 2), -1, 1)
+        return volumes * np.minimum(1, 1 - pans), volumes * np.minimum(1, 1 + pans)
+
+    def get_volume(self, source) -> tuple[float, float]:
+        if source is None:
+            return (1.0, 1.0)
+        offset = source.position - self.listener
+        left, right = self.attenuate(np.array([[offset.x, offset.y]]))
+        return (float(left[0]), float(right[0]))
+
+    def play(self, sound: pygame.mixer.Sound | None, source=None, priority: float = 1.0) -> Voice | None:
+        """Play `sound` coming from `source` (anything with a position, or None to play it as is).
+        Returns the voice it's playing on, or None if it was skipped."""
+        if sound is None:
+            return None
+        left, right = self.get_volume(source)
+        volume = max(left, right)
+        if volume <= 0:
+            return None
+
+        self.voices = [voice for voice in self.voices if voice.is_playing()]
+        used_channels = {voice.channel for voice in self.voices}
+        free_channels = [channel for channel in self.channels if channel not in used_channels]
+        if free_channels:
+            channel = free_channels[0]
+        else:
+            quietest = min(self.voices, key=Voice.get_audibility)
+            if quietest.get_audibility() >= priority * volume:
+                self.skipped_count += 1
+                return None
+            self.voices.remove(quietest)
+            quietest.channel.stop()
+            channel = quietest.channel
+            self.stolen_count += 1
+
+        channel.play(sound)
+        channel.set_volume(left, right)
+        voice = Voice(channel, source, priority)
+        voice.volume = volume
+        self.voices.append(voice)
+        return voice
+
+    def update(self, delta: float, listener: pygame.Vector2) -> None:
+        """Move the listener, and every `update_interval` seconds adjust every voice to where its source is now"""
+        self.listener = pygame.Vector2(listener)
+        self.update_timer += delta
+        if self.update_timer < self.update_interval:
+            return
+        self.update_timer %= self.update_interval
+
+        self.voices = [voice for voice in self.voices if voice.is_playing()]
+        moving = [voice for voice in self.voices if voice.source is not None]
+        if not moving:
+            return
+
+        offsets = np.array([(voice.source.position.x - listener.x, voice.source.position.y - listener.y) for voice in moving])
+        lefts, rights = self.attenuate(offsets)
+        for voice, left, right in zip(moving, lefts.tolist(), rights.tolist()):
+            voice.volume = max(left, right)
+            if voice.volume <= 0:
+                # Out of earshot, let something else have the channel
+                voice.channel.stop()
+            else:
+                voice.channel.set_volume(left, right)
+
+    def stop(self) -> None:
+        for voice in self.voices:
+            voice.channel.stop()
+        self.voices = []
@@ -0,0 +1,106 @@
+import math
+
+import pygame
+
+class SpatialHash:
+    """A uniform grid over the world used to quickly find the entities near a point.
+
+    Entities are stored in the cell containing their `position`. Whenever an
+    entity moves, `update` should be called so that it can be moved to its
+    new cell. Queries only look at the cells overlapping the area asked for,
+    so their cost depends on how crowded that area is rather than on how
+    many entities there are in total.
+    """
+
+    def __init__(self, cell_size: int = 128):
+        self.cell_size = cell_size
+        self.cells: dict[tuple[int, int], set] = {}
+        self.entity_cells: dict[object, tuple[int, int]] = {}
+
+    def __len__(self) -> int:
+        return len(self.entity_cells)
+
+    def __contains__(self, entity) -> bool:
+        return entity in self.entity_cells
+
+    def __iter__(self):
+        return iter(self.entity_cells)
+
+    def cell_of(self, position: pygame.Vector2) -> tuple[int, int]:
+        return (int(position[0] // self.cell_size), int(position[1] // self.cell_size))
+
+    def insert(self, entity) -> None:
+        cell = self.cell_of(entity.position)
+        self.cells.setdefault(cell, set()).add(entity)
+        self.entity_cells[entity] = cell
+
+    def remove(self, entity) -> None:
+        cell = self.entity_cells.pop(entity, None)
+        if cell is None:
+            return
+
+        cell_entities = self.cells[cell]
+        cell_entities.discard(entity)
+        if not cell_entities:
+            del self.cells[cell]
+
+    def update(self, entity) -> None:
+        """Move an entity to the correct cell after its position has changed"""
+        old_cell = self.entity_cells.get(entity)
+        new_cell = self.cell_of(entity.position)
+        if old_cell == new_cell:
+            return
+
+        if old_cell is not None:
+            self.remove(entity)
+        self.cells.setdefault(new_cell, set()).add(entity)
+        self.entity_cells[entity] = new_cell
+
+    def clear(self) -> None:
+        self.cells.clear()
+        self.entity_cells.clear()
+
+    def query_rect(self, rect: pygame.Rect) -> list:
+        """Return every entity in the cells overlapping `rect`. Entities near the
+        edges of the rect may be just outside of it.
+        """
+
+        first_col, first_row = self.cell_of(rect.topleft)
+        last_col, last_row = self.cell_of(rect.bottomright)
+        found = []
+        for col in range(first_col, last_col + 1):
+            for row in range(first_row, last_row + 1):
+                cell_entities = self.cells.get((col, row))
+                if cell_entities:
+                    found.extend(cell_entities)
+
+        return found
+
+    def query_radius(self, position: pygame.Vector2, radius: float) -> list:
+        """Return every entity closer than `radius` to `position`"""
+        search_rect = pygame.Rect(position[0] - radius, position[1] - radius, radius * 2, radius * 2)
+        radius_squared = radius * radius
+        return [entity for entity in self.query_rect(search_rect)
+                if position.distance_squared_to(entity.position) < radius_squared]
+
+    def query_cone(self, position: pygame.Vector2, orientation: float, arc: float, radius: float) -> list:
+        """Return every entity inside of a cone, such as a light.
+
+        `orientation` is the direction the cone points in DEGREES (using the
+        same convention as Entity.orientation), and `arc` is the full width of
+        the cone in radians.
+        """
+
+        orientation_rad = math.radians(orientation)
+        direction = pygame.Vector2(math.cos(orientation_rad), -math.sin(orientation_rad))
+        cos_half_arc = math.cos(arc / 2)
+
+        found = []
+        for entity in self.query_radius(position, radius):
+            offset = entity.position - position
+            # Compare against the cosine of the angle rather than the angle itself to avoid acos
+            length = offset.length()
+            if length == 0 or offset.dot(direction) > cos_half_arc * length:
+                found.append(entity)
+
+        return found
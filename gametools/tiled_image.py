@@ -0,0 +1,159 @@
+import math
+import os
+from collections import OrderedDict
+
+import pygame
+
+class TiledImage:
+    """A very large image (like the world map) split into fixed-size tiles.
+
+    The first time an image is used it is cut into tiles, along with a few
+    half-resolution mip levels for zoomed out views, and saved to a cache
+    folder. After that only the tiles that are actually on screen are loaded
+    from disk, and the least recently used ones are thrown away once there
+    are more than `max_resident_tiles` of them in memory.
+    """
+
+    CACHE_VERSION = 1
+
+    def __init__(self, path: str, tile_size: int = 256, max_resident_tiles: int = 64,
+                 max_scaled_tiles: int = 128, cache_root: str = "assets/cache/tiles"):
+        self.path = path
+        self.tile_size = tile_size
+        self.max_resident_tiles = max_resident_tiles
+        self.max_scaled_tiles = max_scaled_tiles
+
+        name = os.path.splitext(os.path.basename(path))[0]
+        self.cache_dir = os.path.join(cache_root, f"{name}_{tile_size}")
+
+        # (level, col, row) -> Surface, in least -> most recently used order
+        self.resident_tiles: OrderedDict[tuple[int, int, int], pygame.Surface] = OrderedDict()
+        # (level, col, row, size) -> Surface, tiles rescaled for the current zoom level
+        self.scaled_tiles: OrderedDict[tuple, pygame.Surface] = OrderedDict()
+
+        self.size = (0, 0)
+        self.levels = 0
+        if not self.read_index():
+            self.build_cache()
+
+    def get_size(self) -> tuple[int, int]:
+        return self.size
+
+    def source_signature(self) -> str:
+        """Used to tell if the tiles on disk were cut from the current version of the image"""
+        stat = os.stat(self.path)
+        return f"{TiledImage.CACHE_VERSION} {stat.st_mtime_ns} {stat.st_size} {self.tile_size}"
+
+    def read_index(self) -> bool:
+        """Read the size and number of mip levels of the cached tiles.
+        Returns False if there is no cache or it is out of date.
+        """
+
+        try:
+            with open(os.path.join(self.cache_dir, "index.txt")) as f:
+                signature = f.readline().strip()
+                width, height, levels = (int(val) for val in f.readline().split())
+        except (OSError, ValueError):
+            return False
+
+        if signature != self.source_signature():
+            return False
+
+        self.size = (width, height)
+        self.levels = levels
+        return True
+
+    def build_cache(self) -> None:
+        """Cut the source image (and its mip levels) into tiles and save them to disk"""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        level_image = pygame.image.load(self.path)
+        self.size = level_image.get_size()
+
+        level = 0
+        while True:
+            width, height = level_image.get_size()
+            for col in range(math.ceil(width / self.tile_size)):
+                for row in range(math.ceil(height / self.tile_size)):
+                    tile_rect = pygame.Rect(col * self.tile_size, row * self.tile_size, self.tile_size, self.tile_size)
+                    tile_rect = tile_rect.clip(level_image.get_rect())
+                    pygame.image.save(level_image.subsurface(tile_rect), self.tile_path(level, col, row))
+
+            level += 1
+            # Stop once a whole level fits in a single tile
+            if max(width, height) <= self.tile_size:
+                break
+            level_image = pygame.transform.smoothscale(level_image, (max(1, width // 2), max(1, height // 2)))
+
+        self.levels = level
+        with open(os.path.join(self.cache_dir, "index.txt"), 'w') as f:
+            f.write(self.source_signature() + "\n")
+            f.write(f"{self.size[0]} {self.size[1]} {self.levels}\n")
+
+    def tile_path(self, level: int, col: int, row: int) -> str:
+        return os.path.join(self.cache_dir, f"{level}_{col}_{row}.png")
+
+    def get_tile(self, level: int, col: int, row: int) -> pygame.Surface:
+        """Return a tile, loading it from disk if it isn't already resident"""
+        key = (level, col, row)
+        tile = self.resident_tiles.get(key)
+        if tile is not None:
+            self.resident_tiles.move_to_end(key)
+            return tile
+
+        tile = pygame.image.load(self.tile_path(level, col, row)).convert()
+        self.resident_tiles[key] = tile
+        while len(self.resident_tiles) > self.max_resident_tiles:
+            self.resident_tiles.popitem(last=False)
+
+        return tile
+
+    def get_scaled_tile(self, level: int, col: int, row: int, size: tuple[int, int]) -> pygame.Surface:
+        """Return a tile resized to `size`, reusing the result while the zoom doesn't change"""
+        key = (level, col, row, size)
+        tile = self.scaled_tiles.get(key)
+        if tile is not None:
+            self.scaled_tiles.move_to_end(key)
+            return tile
+
+        tile = pygame.transform.scale(self.get_tile(level, col, row), size)
+        self.scaled_tiles[key] = tile
+        while len(self.scaled_tiles) > self.max_scaled_tiles:
+            self.scaled_tiles.popitem(last=False)
+
+        return tile
+
+    def draw(self, surface: pygame.Surface, camera) -> None:
+        """Draw the tiles that overlap `surface` (or just its clip area, if it has one) as seen through `camera`"""
+
+        # Pick the smallest mip level that is still at least as detailed as the screen
+        level = 0
+        while level + 1 < self.levels and camera.scale <= 0.5 ** (level + 1):
+            level += 1
+        level_scale = 0.5 ** level
+        level_tile_size = self.tile_size / level_scale # Size of a tile of this level in world space
+
+        clip = surface.get_clip()
+        top_left = camera.screen_to_world(pygame.Vector2(clip.topleft))
+        bottom_right = camera.screen_to_world(pygame.Vector2(clip.bottomright))
+        level_cols = math.ceil(self.size[0] * level_scale / self.tile_size)
+        level_rows = math.ceil(self.size[1] * level_scale / self.tile_size)
+        first_col = max(0, int(top_left.x // level_tile_size))
+        first_row = max(0, int(top_left.y // level_tile_size))
+        last_col = min(level_cols - 1, int(bottom_right.x // level_tile_size))
+        last_row = min(level_rows - 1, int(bottom_right.y // level_tile_size))
+
+        # Work out every tile's position from the map's origin so neighboring tiles line up without seams
+        origin = camera.world_to_screen(pygame.Vector2(0, 0))
+        origin = (int(origin.x), int(origin.y))
+        screen_tile_size = level_tile_size * camera.scale
+
+        for col in range(first_col, last_col + 1):
+            for row in range(first_row, last_row + 1):
+                tile = self.get_tile(level, col, row)
+                screen_pos = (origin[0] + round(col * screen_tile_size), origin[1] + round(row * screen_tile_size))
+                if camera.scale != level_scale:
+                    screen_end = (origin[0] + round(col * screen_tile_size + tile.get_width() * camera.scale / level_scale),
+                                  origin[1] + round(row * screen_tile_size + tile.get_height() * camera.scale / level_scale))
+                    size = (screen_end[0] - screen_pos[0], screen_end[1] - screen_pos[1])
+                    tile = self.get_scaled_tile(level, col, row, size)
+                surface.blit(tile, screen_pos)
@@ -0,0 +1,99 @@
+"""Reading and writing the binary level files that hold where props are placed in the world.
+
+A level file is a header followed by an array of fixed-size records:
+
+    header: magic (4 bytes), version (u16), record size (u16), record count (u32)
+    record: type id (u16), flags (u16), x (f32), y (f32), two optional params (f32)
+
+Convert an old text map with: python level_data.py mapdata.txt mapdata.lvl
+"""
+
+import mmap
+import os
+import struct
+import sys
+from ast import literal_eval
+from typing import NamedTuple
+
+MAGIC = b"GTGL"
+VERSION = 1
+HEADER = struct.Struct("<4sHHI")
+RECORD = struct.Struct("<HHffff")
+
+# The index of each name is its type id in the file, so only ever add to the end of this list
+PROP_TYPES = ["Creature", "Tree", "Humanoid", "StreetLamp"]
+
+# What each prop looks like in the editor and in the world
+PROP_IMAGES = {
+    "Creature": "assets/imgs/Creature/creature_idle1.png",
+    "Tree": "assets/imgs/tree.png",
+    "Humanoid": "assets/imgs/Humanoid1.png",
+    "StreetLamp": "assets/imgs/Props/StreetLamp.png",
+}
+
+# Lights shine this far unless their record's first param says otherwise
+DEFAULT_LIGHT_RADIUS = 300
+
+class LevelRecord(NamedTuple):
+    prop_type: str
+    x: float
+    y: float
+    params: tuple[float, float] = (0.0, 0.0)
+    flags: int = 0
+
+class LevelFormatError(Exception):
+    pass
+
+def load_level(path: str) -> list[LevelRecord]:
+    """Read every record from a level file"""
+    with open(path, 'rb') as f:
+        # mmap can't map an empty file, and there has to be a whole header to read
+        if os.fstat(f.fileno()).st_size < HEADER.size:
+            raise LevelFormatError(f"`{path}` is not a level file")
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    with data:
+        magic, version, record_size, count = HEADER.unpack_from(data, 0)
+        if magic != MAGIC:
+            raise LevelFormatError(f"`{path}` is not a level file")
+        if version != VERSION or record_size != RECORD.size:
+            raise LevelFormatError(f"`{path}` is level version {version}, expected {VERSION}")
+        if HEADER.size + count * record_size > len(data):
+            raise LevelFormatError(f"`{path}` is truncated")
+
+        records = []
+        for idx in range(count):
+            type_id, flags, x, y, param1, param2 = RECORD.unpack_from(data, HEADER.size + idx * record_size)
+            if type_id >= len(PROP_TYPES):
+                raise LevelFormatError(f"Unknown prop type id {type_id} in `{path}`")
+            records.append(LevelRecord(PROP_TYPES[type_id], x, y, (param1, param2), flags))
+
+    return records
+
+def save_level(path: str, records: list[LevelRecord]) -> None:
+    with open(path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, RECORD.size, len(records)))
+        for record in records:
+            f.write(RECORD.pack(PROP_TYPES.index(record.prop_type), record.flags, record.x, record.y, *record.params))
+
+def load_text_level(path: str) -> list[LevelRecord]:
+    """Read the old text format, with one `"PropType", (x, y)` per line"""
+    records = []
+    with open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            prop_type, prop_coord = literal_eval(line)
+            records.append(LevelRecord(prop_type, *prop_coord))
+
+    return records
+
+def convert_text_level(text_path: str, level_path: str) -> None:
+    save_level(level_path, load_text_level(text_path))
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("Usage: python level_data.py <mapdata.txt> <output.lvl>")
+        sys.exit(1)
+
+    convert_text_level(sys.argv[1], sys.argv[2])
@@ -1,6 +1,8 @@
 from __future__ import annotations
 
 import math
+
+import numpy as np
 import pygame
 
 import helpers
@@ -10,12 +12,19 @@ import entity
 class Light(entity.Entity):
     """A light source that can reveal the true nature of others'"""
 
+    # The flicker changes the alpha of the rotated image
+    share_rotations = False
+
     def __init__(self, position, world, angle_offset=0):
         self.arc = 20.0 * helpers.DEG_TO_RAD # degrees
         size = 500
         center = size / 2
         self.radius = size / 2
         self.timer = 0
+        # A point is in the cone if the cosine of its angle from the direction of the light is above this
+        self.cos_half_arc = math.cos(self.arc / 2)
+        self._direction = pygame.Vector2(1, 0)
+        self._direction_orientation = 0
 
         # Since the light is also an entity, the light is drawn once on
         # creation to a Surface big enough to hold a circle with radius = self.radius.
@@ -37,18 +46,44 @@ class Light(entity.Entity):
         # Finally do the entity constructor once we have the image
         entity.Entity.__init__(self, position, light_image, world)
 
+    def get_direction(self) -> pygame.Vector2:
+        """The unit vector the light points in, only worked out again when the orientation changes"""
+        if self.orientation != self._direction_orientation:
+            orientation_rad = self.orientation * helpers.DEG_TO_RAD
+            self._direction = pygame.Vector2(math.cos(orientation_rad), -math.sin(orientation_rad))
+            self._direction_orientation = self.orientation
+        return self._direction
+
     def in_light(self, check_pos: pygame.Vector2) -> bool:
         """Returns true if `check_pos` is within the light cone."""
-        orientation_rad = self.orientation * helpers.DEG_TO_RAD
-        orientation_vec = pygame.Vector2(math.cos(orientation_rad), -math.sin(orientation_rad))
         offset_vec = check_pos - self.position
 
         # if the distance is further than the radius, the point is outside the light.
-        if offset_vec.length() > self.radius:
+        length_squared = offset_vec.length_squared()
+        if length_squared > self.radius * self.radius:
             return False
 
-        # for two normalized vectors, a and b, the angle between them is acos(dot(a, b))
-        return math.acos(offset_vec.normalize().dot(orientation_vec)) < self.arc / 2
+        # for two vectors a and b, dot(a, b) = |a| |b| cos(angle between them), so comparing
+        # against the cosine of half the arc avoids normalizing and acos
+        return length_squared == 0 or offset_vec.dot(self.get_direction()) > self.cos_half_arc * math.sqrt(length_squared)
+
+    def in_light_batch(self, positions: np.ndarray) -> np.ndarray:
+        """in_light for many points at once, `positions` is an (N, 2) array. Returns an array of N bools"""
+        direction = self.get_direction()
+        offsets = positions - (self.position.x, self.position.y)
+        lengths_squared = np.einsum('ij,ij->i', offsets, offsets)
+        dots = offsets @ (direction.x, direction.y)
+
+        in_cone = dots > self.cos_half_arc * np.sqrt(lengths_squared)
+        return (lengths_squared <= self.radius * self.radius) & (in_cone | (lengths_squared == 0))
+
+    def entities_in_light(self, entities: list) -> list:
+        """The entities out of `entities` that are within the light cone"""
+        if not entities:
+            return []
+        positions = np.fromiter((coord for other_entity in entities for coord in other_entity.position), dtype=np.float64, count=len(entities) * 2)
+        lit = self.in_light_batch(positions.reshape(-1, 2))
+        return [other_entity for other_entity, is_lit in zip(entities, lit.tolist()) if is_lit]
 
     def update(self, delta: float) -> None:
         """Adds a flicker effect"""
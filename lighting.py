@@ -0,0 +1,149 @@
+import math
+
+import numpy as np
+import pygame
+
+import navigation
+
+from gametools.spatial_hash import SpatialHash
+
+# Glow images shared by every light of the same radius and intensity
+glow_images: dict[tuple[int, int], pygame.Surface] = {}
+
+def get_glow_image(radius: int, intensity: int) -> pygame.Surface:
+    """A white circle that is `intensity` opaque in the middle and fades out towards `radius`"""
+    key = (radius, intensity)
+    if key not in glow_images:
+        size = radius * 2 + 1
+        image = pygame.Surface((size, size), pygame.SRCALPHA)
+        image.fill((255, 255, 255, 0))
+        offsets = np.arange(size) - radius
+        distances = np.hypot(offsets[:, np.newaxis], offsets[np.newaxis, :]) / radius
+        alpha = pygame.surfarray.pixels_alpha(image)
+        alpha[:] = (np.clip(1 - distances * distances, 0, 1) * intensity).astype(np.uint8)
+        del alpha
+        glow_images[key] = image
+    return glow_images[key]
+
+class PointLight:
+    """A light that shines in every direction, like a street lamp, but not through walls.
+
+    What it lights is worked out by casting rays against the navigation field,
+    which gives a visibility polygon. Light spills `wall_depth` px past the edge
+    of the road so it still lights up what is next to it. The polygon and the
+    image cut out to it are kept until the light moves, so static lights only
+    ever work them out once.
+    """
+
+    next_id = 0
+
+    def __init__(self, position: pygame.Vector2, radius: int = 300, intensity: int = 220,
+                 ray_count: int = 256, wall_depth: float = 48):
+        self.position = pygame.Vector2(position)
+        self.radius = radius
+        self.intensity = intensity
+        self.ray_count = ray_count
+        self.wall_depth = wall_depth
+
+        self.angles = np.arange(ray_count) * (2 * math.pi / ray_count)
+        # How far each ray got, the point the rays start from, and the light cut out to the polygon
+        self.ray_distances = None
+        self.origin = None
+        self.image = None
+        # Where the light was when they were worked out
+        self.light_position = None
+
+        # Keeps the order lights are drawn in the same from frame to frame
+        self.id = PointLight.next_id
+        PointLight.next_id = self.id + 1
+
+    def update_visibility(self, navigation_field: navigation.NavigationField) -> bool:
+        """Work out the visibility polygon again if the light moved, returns True if it did"""
+        if self.position == self.light_position:
+            return False
+        self.light_position = self.position.copy()
+
+        # Lamps stand next to the road, so shine from the closest spot on it
+        self.origin = navigation_field.nearest_walkable(self.position)
+        self.ray_distances = navigation_field.cast_rays(self.origin, self.angles, self.radius, self.wall_depth)
+
+        glow = get_glow_image(self.radius, self.intensity)
+        center = pygame.Vector2(self.radius, self.radius)
+        points = [center + pygame.Vector2(math.cos(angle), -math.sin(angle)) * distance
+                  for angle, distance in zip(self.angles.tolist(), self.ray_distances.tolist())]
+        cutout = pygame.Surface(glow.get_size(), pygame.SRCALPHA)
+        cutout.fill((0, 0, 0, 0))
+        pygame.draw.polygon(cutout, (255, 255, 255, 255), points)
+        self.image = glow.copy()
+        self.image.blit(cutout, (0, 0), special_flags=pygame.BLEND_RGBA_MULT)
+        return True
+
+    def get_area(self) -> pygame.Rect:
+        """The part of the world the light could reach"""
+        return pygame.Rect(self.position.x - self.radius - self.wall_depth, self.position.y - self.radius - self.wall_depth,
+                           (self.radius + self.wall_depth) * 2, (self.radius + self.wall_depth) * 2)
+
+    def in_light_batch(self, positions: np.ndarray) -> np.ndarray:
+        """Which of the points in the (N, 2) array `positions` are inside the visibility polygon"""
+        offsets = positions - (self.origin.x, self.origin.y)
+        angles = np.arctan2(-offsets[:, 1], offsets[:, 0]) % (2 * math.pi)
+        rays = np.rint(angles / (2 * math.pi / self.ray_count)).astype(np.intp) % self.ray_count
+        return np.hypot(offsets[:, 0], offsets[:, 1]) <= self.ray_distances[rays]
+
+class Lighting:
+    """Every light in the world besides the player's headlight.
+
+    Static lights are kept in a SpatialHash so only the ones near the screen are
+    looked at, their visibility is worked out the first time they are. Dynamic
+    lights are checked every frame, but only cast rays again when they move.
+    """
+
+    def __init__(self, navigation_field: navigation.NavigationField):
+        self.navigation = navigation_field
+        self.static_index = SpatialHash(cell_size=512)
+        self.dynamic_lights: list[PointLight] = []
+        # Lights are found by their position, so queries are grown by this much to catch their edges
+        self.max_reach = 0
+
+    def __len__(self) -> int:
+        return len(self.static_index) + len(self.dynamic_lights)
+
+    def add(self, light: PointLight, static: bool = True) -> None:
+        if static:
+            self.static_index.insert(light)
+        else:
+            self.dynamic_lights.append(light)
+        self.max_reach = max(self.max_reach, light.radius + light.wall_depth)
+
+    def remove(self, light: PointLight) -> None:
+        self.static_index.remove(light)
+        if light in self.dynamic_lights:
+            self.dynamic_lights.remove(light)
+
+    def lights_in(self, rect: pygame.Rect) -> list[PointLight]:
+        """The lights that could shine on `rect`, with their visibility up to date"""
+        candidates = self.static_index.query_rect(rect.inflate(self.max_reach * 2, self.max_reach * 2)) + self.dynamic_lights
+        lights = sorted((light for light in candidates if light.get_area().colliderect(rect)), key=lambda light: light.id)
+        for light in lights:
+            light.update_visibility(self.navigation)
+        return lights
+
+    def screen_lights(self, camera) -> list[tuple[pygame.Surface, pygame.Rect]]:
+        """The image of each light on the screen and where it goes, for the fog to cut out"""
+        screen_lights = []
+        for light in self.lights_in(camera.view_rect()):
+            rect = light.image.get_rect()
+            rect.center = camera.world_to_screen(light.origin)
+            screen_lights.append((light.image, rect))
+        return screen_lights
+
+    def entities_in_light(self, entity_index: SpatialHash, rect: pygame.Rect) -> set:
+        """The entities in `entity_index` lit up by any of the lights shining on `rect`"""
+        lit = set()
+        for light in self.lights_in(rect):
+            entities = entity_index.query_rect(light.get_area())
+            if not entities:
+                continue
+            positions = np.array([(other_entity.position.x, other_entity.position.y) for other_entity in entities])
+            lit.update(other_entity for other_entity, is_lit in zip(entities, light.in_light_batch(positions).tolist()) if is_lit)
+        return lit
@@ -1,30 +1,111 @@
 import pygame
 
 import helpers
+import replay
 import world
+import argparse
 import os
 from enum import Enum
 
+from gametools.asset_loader import AssetLoader
+from gametools.frame_pacer import FramePacer
+from gametools.ImageLoader import ImageLoader
+from gametools.perf_hud import PerfHUD
+from gametools.profiling import FrameProfiler, PhaseTimer
+
 class GameState(Enum):
     MENU = 1
-    GAMING = 2
-    WIN = 3
-
-def run():
+    LOADING = 2
+    GAMING = 3
+    WIN = 4
+
+def draw_loading_screen(screen: pygame.Surface, progress: float, loading_name: str) -> None:
+    screen.fill((0, 0, 0))
+
+    loading_text_rendered = helpers.CREEPY_FONT.render("LOADING", True, (255, 255, 255))
+    loading_text_rendered_rect = loading_text_rendered.get_rect()
+    loading_text_rendered_rect.center = (helpers.CENTER_X, helpers.CENTER_Y - 50)
+    screen.blit(loading_text_rendered, loading_text_rendered_rect)
+
+    bar_area = pygame.Rect(0, 0, 400, 20)
+    bar_area.center = (helpers.CENTER_X, helpers.CENTER_Y + 10)
+    pygame.draw.rect(screen, (255, 255, 255), (bar_area.x, bar_area.y, bar_area.width * progress, bar_area.height))
+    pygame.draw.rect(screen, (255, 255, 255), bar_area, 2)
+
+    name_text_rendered = helpers.REGULAR_FONT.render(loading_name, True, (150, 150, 150))
+    name_text_rendered_rect = name_text_rendered.get_rect()
+    name_text_rendered_rect.center = (helpers.CENTER_X, helpers.CENTER_Y + 50)
+    screen.blit(name_text_rendered, name_text_rendered_rect)
+
+def debug_lines(game_world: world.World | None, pacer: FramePacer, profiler: FrameProfiler) -> list[str]:
+    """Everything besides the frame timings that the performance HUD shows"""
+    lines = [f"target {pacer.target_fps} fps, {pacer.frame_cost * 1000:.2f} ms of work a frame"]
+    if game_world is not None:
+        lod = game_world.simulation_lod
+        lines.append(f"entities {len(game_world.other_entity_group)}: {lod.active_count} active, {lod.reduced_count} reduced")
+        audio = game_world.audio
+        lines.append(f"sounds {game_world.sounds.get_memory() / 2**20:.1f} MB decoded, {len(audio.voices)}/{audio.max_voices} voices, "
+                     f"{audio.skipped_count} skipped, {audio.stolen_count} stolen")
+        lines.append(f"sprites {game_world.drawn_count} drawn, {game_world.culled_count} culled, {len(game_world.lit_entities)} lit")
+
+        world_pos = game_world.camera.screen_to_world(pygame.mouse.get_pos())
+        try:
+            lines.append(f"mouse ({world_pos.x:.0f}, {world_pos.y:.0f}), in mask: {game_world.world_mask.get_at(world_pos)}")
+        except IndexError:
+            lines.append("mouse OFF MAP")
+
+    stats = ImageLoader.GetStats()
+    lines.append(f"images {stats['total_bytes'] / 2**20:.1f} MB "
+                 f"({stats['images']} loaded, {stats['scaled']} scaled, {stats['rotated']} rotated)")
+
+    if profiler.is_running():
+        lines.append(f"profiling, {profiler.frames_left} frames left")
+    elif profiler.last_path is not None:
+        lines.append(f"saved {profiler.last_path}.prof")
+    else:
+        lines.append("F4 to profile the next 120 frames")
+    return lines
+
+def run(dirty_rendering: bool = False, record_path: str | None = None, replay_path: str | None = None):
+    """`dirty_rendering` only redraws the parts of the screen that changed while the player
+    stands still, which helps a lot on slow machines. Each game is recorded to `record_path`
+    if it's given, and `replay_path` plays a recording back instead of reading the keyboard"""
     state = GameState.MENU
     menuWidth = 300
     menuHeight = 150
+    # The menu's button, the win screen's text is centered on it too
+    menu_area = pygame.Rect(helpers.WIDTH/2 - menuWidth/2, helpers.HEIGHT/2 - menuHeight/2, menuWidth, menuHeight)
     screen = pygame.display.set_mode(helpers.SCREEN_SIZE)
     pygame.display.set_caption("Spooky game for game jam!")
 
     clock = pygame.time.Clock()
+    # The game is simulated in fixed steps, however long frames take to draw
+    pacer = FramePacer()
     done = False
 
     game_world = None
     win_timer = 5
 
+    recorder = None
+    playback = None
+    if replay_path is not None:
+        playback = replay.Replay(replay_path)
+        dirty_rendering = playback.dirty_rendering
+
+    # F3 shows how long frames take, F4 profiles the next few frames
+    profiler = FrameProfiler()
+    hud = PerfHUD(PhaseTimer(), helpers.REGULAR_FONT, lambda: debug_lines(game_world, pacer, profiler))
+
+    asset_loader = None
+    loading_name = ""
+    def show_loaded(finished: int, total: int, name: str) -> None:
+        nonlocal loading_name
+        loading_name = name
+
     while not done:
-        delta = clock.tick(144) / 1000.0
+        delta = pacer.tick(clock)
+        # The parts of the screen that changed this frame, None for all of it
+        updated_areas = None
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 done = True
@@ -32,11 +113,26 @@ def run():
             elif event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_ESCAPE:
                     done = True
+                elif event.key == pygame.K_F3:
+                    hud.toggle()
+                    if game_world is not None:
+                        # Nothing else would draw over where the HUD was
+                        game_world.redraw_everything()
+                elif event.key == pygame.K_F4:
+                    profiler.start()
+
+        if state == GameState.MENU and playback is not None:
+            # Go straight into the game, and stop once the replay has been played back
+            if playback.next_frame_index > 0:
+                done = True
+            else:
+                state = GameState.LOADING
+                asset_loader = AssetLoader(on_progress=show_loaded)
+                world.World.queue_assets(asset_loader)
 
-        if state == GameState.MENU:
+        elif state == GameState.MENU:
             screen.fill((0, 0, 0))
             pos = pygame.mouse.get_pos()
-            menu_area = pygame.Rect(helpers.WIDTH/2 - menuWidth/2, helpers.HEIGHT/2 - menuHeight/2, menuWidth, menuHeight)
             hovering = menu_area.collidepoint(*pos)
             pygame.draw.rect(screen, (255,255,255), menu_area, 5 if hovering else 3)
 
@@ -54,12 +150,48 @@ def run():
 
             leftClick = pygame.mouse.get_pressed() == (1,0,0)
             if hovering and leftClick:
+                # Load the world's images and sounds in the background, the game starts once they're all loaded
+                state = GameState.LOADING
+                asset_loader = AssetLoader(on_progress=show_loaded)
+                world.World.queue_assets(asset_loader)
+
+        elif state == GameState.LOADING:
+            if asset_loader.poll():
+                asset_loader.shutdown()
+                asset_loader = None
+                # Everything the World needs is cached now, so creating it is quick
+                seed = playback.seed if playback is not None else None
+                game_world = world.World(dirty_rendering=dirty_rendering, seed=seed)
+                hud.timer = game_world.timer
+                if record_path is not None:
+                    recorder = replay.ReplayRecorder(record_path, game_world.seed, dirty_rendering)
+                pacer.reset()
                 state = GameState.GAMING
-                game_world = world.World()
+            else:
+                draw_loading_screen(screen, asset_loader.get_progress(), loading_name)
 
         elif state == GameState.GAMING:
-            game_world.handle_input()
-            game_world.update(delta)
+            if playback is not None:
+                frame = playback.next_frame()
+                if frame is None:
+                    frame = replay.ReplayFrame([], 1.0, False)
+                    state = GameState.MENU
+            else:
+                pressed_keys = pygame.key.get_pressed()
+                steps = pacer.advance(delta)
+                # Under heavy load some frames aren't drawn at all so the game can keep up
+                frame = replay.ReplayFrame([(pressed_keys, pacer.step)] * steps, pacer.alpha, pacer.should_draw())
+
+            timer = game_world.timer
+            for pressed_keys, step_delta in frame.steps:
+                with timer.phase("input"):
+                    game_world.handle_input(pressed_keys)
+                with timer.phase("update"):
+                    game_world.update(step_delta)
+                if recorder is not None:
+                    recorder.record_step(pressed_keys, step_delta)
+                if not game_world.player_sprite.alive() or game_world.won:
+                    break
 
             if not game_world.player_sprite.alive():
                 state = GameState.MENU
@@ -68,17 +200,12 @@ def run():
                 state = GameState.WIN
                 win_timer = 5
 
-            pos = pygame.mouse.get_pos()
-            try:
-                world_pos = game_world.camera.screen_to_world(pos)
-                pygame.display.set_caption(f"coord: {world_pos}, in mask: {game_world.world_mask.get_at(world_pos)}")
-            except IndexError:
-                pygame.display.set_caption(f"OFF MAP")
-
-            # Background
-            screen.fill((50, 25, 15))
-
-            game_world.draw(screen)
+            updated_areas = game_world.draw(screen, frame.alpha) if frame.drawn else []
+            if recorder is not None:
+                recorder.end_frame(frame.alpha, frame.drawn)
+                if state != GameState.GAMING:
+                    recorder.close()
+                    recorder = None
 
         elif state == GameState.WIN:
             win_timer -= delta
@@ -94,9 +221,33 @@ def run():
             if win_timer <= 0:
                 state = GameState.MENU
 
-        pygame.display.update()
+        hud.add_frame(delta)
+        hud_area = hud.draw(screen)
+        if hud_area is not None and updated_areas is not None:
+            updated_areas.append(hud_area)
+
+        with hud.timer.phase("display"):
+            if updated_areas is None:
+                pygame.display.update()
+            else:
+                pygame.display.update(updated_areas)
+        hud.timer.end_frame()
+        pacer.frame_done()
+        profiler.end_frame()
+
+    if recorder is not None:
+        recorder.close()
     pygame.quit()
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dirty-rects", action="store_true", help="only redraw the parts of the screen that changed")
+    parser.add_argument("--record", metavar="FILE", help="record each game to FILE so it can be replayed")
+    parser.add_argument("--replay", metavar="FILE", help="play back a recorded game")
+    args = parser.parse_args()
+    # The paths are relative to where the game was started from, not the game's folder
+    record_path = os.path.abspath(args.record) if args.record else None
+    replay_path = os.path.abspath(args.replay) if args.replay else None
+
     os.chdir(os.path.dirname(os.path.abspath(__file__)))
-    run()
\ No newline at end of file
+    run(args.dirty_rects, record_path, replay_path)
\ No newline at end of file
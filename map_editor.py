@@ -1,39 +1,47 @@
 from email.mime import base
+import os
+
 import pygame
 
 import helpers
 import camera
+import level_data
 
 from gametools import ImageLoader
+from gametools.tiled_image import TiledImage
+
+LEVEL_PATH = "mapdata.lvl"
 
-def create_prop_sprite(image_path, location) -> pygame.sprite.Sprite:
+def create_prop_sprite(image_path, location, params=(0.0, 0.0), flags=0) -> pygame.sprite.Sprite:
     prop_sprite = pygame.sprite.Sprite()
     prop_sprite.image = ImageLoader.ImageLoader.GetImage(image_path)
     prop_sprite.rect = prop_sprite.image.get_rect()
     prop_sprite.rect.center = location
     prop_sprite.path = image_path
+    # The editor can't change these, but they're kept so saving doesn't reset them (like a lamp's radius)
+    prop_sprite.params = params
+    prop_sprite.flags = flags
     return prop_sprite
 
 def run():
 
     screen = pygame.display.set_mode(helpers.SCREEN_SIZE)
 
-    base_image = ImageLoader.ImageLoader.GetImage("assets/imgs/TheMap.png")
-    world_image = base_image
+    world_image = TiledImage("assets/imgs/TheMap.png")
     world_camera = camera.Camera(pygame.Vector2(0, 0))
 
-    path_start = "assets/imgs/"
-    prop_associations = {
-        path_start + "Creature/creature_idle1.png": "Creature",
-        path_start + "tree.png": "Tree",
-        path_start + "Humanoid1.png": "Humanoid"
-    }
+    prop_associations = {image_path: prop_type for prop_type, image_path in level_data.PROP_IMAGES.items()}
 
     prop_strings = [key for key in prop_associations]
     current_prop_index = 0
     current_prop = prop_strings[current_prop_index]
     placed_props = pygame.sprite.Group()
 
+    # Start from what has already been placed
+    if os.path.exists(LEVEL_PATH):
+        for record in level_data.load_level(LEVEL_PATH):
+            placed_props.add(create_prop_sprite(level_data.PROP_IMAGES[record.prop_type], (record.x, record.y), record.params, record.flags))
+
     done = False
     while not done:
         mouse_pos = pygame.Vector2(pygame.mouse.get_pos())
@@ -56,11 +64,9 @@ def run():
                     current_prop = prop_strings[current_prop_index]
 
                 elif event.key == pygame.K_e:
-                    with open("mapdata.txt", 'w') as f:
-                        for prop in placed_props:
-                            world_position = prop.rect.center
-                            association = prop_associations[prop.path]
-                            f.write(f"\"{association}\", {world_position}\n")
+                    records = [level_data.LevelRecord(prop_associations[prop.path], *prop.rect.center, prop.params, prop.flags)
+                               for prop in placed_props]
+                    level_data.save_level(LEVEL_PATH, records)
 
             elif event.type == pygame.MOUSEWHEEL:
                 # zooming
@@ -73,8 +79,6 @@ def run():
 
                 world_camera.position += old_mouse_world - new_mouse_world
 
-                world_image = pygame.transform.scale(base_image, pygame.Vector2(base_image.get_size()) * world_camera.scale)
-
             elif event.type == pygame.MOUSEBUTTONDOWN:
                 if event.button == 1:
                     new_prop = create_prop_sprite(current_prop, world_camera.screen_to_world(mouse_pos))
@@ -99,7 +103,7 @@ def run():
         screen.fill((255, 255, 255))
 
         # Map
-        screen.blit(world_image, world_camera.world_to_screen(pygame.Vector2(0, 0)))
+        world_image.draw(screen, world_camera)
 
         # Props
         for prop in placed_props:
@@ -0,0 +1,230 @@
+import os
+
+import numpy as np
+import pygame
+
+class NavigationField:
+    """Precomputed information about where entities can go, built from the world mask.
+
+    The mask is sampled on a grid of `cell_size` px cells, and for every cell
+    we store the signed distance to the edge of the walkable area (positive
+    inside it, negative outside) and the closest walkable cell. This turns
+    questions like "where is the closest spot the player can stand" or "which
+    way is away from the wall" into a single lookup.
+
+    Building the field takes a moment, so it is saved next to the mask image
+    and only rebuilt when the image changes.
+    """
+
+    CACHE_VERSION = 1
+
+    def __init__(self, world_mask: pygame.mask.Mask, mask_path: str, cell_size: int = 8):
+        self.world_mask = world_mask
+        self.cell_size = cell_size
+        self.cache_path = os.path.splitext(mask_path)[0] + ".nav.npz"
+
+        stat = os.stat(mask_path)
+        self.signature = np.array([NavigationField.CACHE_VERSION, stat.st_mtime_ns, stat.st_size, cell_size], dtype=np.int64)
+        if not self.load_cache():
+            self.build()
+            self.save_cache()
+
+        self.grid_size = self.walkable.shape
+
+    def load_cache(self) -> bool:
+        """Load a previously built field, returns False if there isn't an up to date one"""
+        try:
+            with np.load(self.cache_path) as data:
+                if not np.array_equal(data["signature"], self.signature):
+                    return False
+                self.walkable = data["walkable"]
+                self.signed_distance = data["signed_distance"]
+                self.nearest_walkable_cell = data["nearest_walkable_cell"]
+        except (OSError, KeyError, ValueError):
+            return False
+
+        return True
+
+    def save_cache(self) -> None:
+        np.savez(self.cache_path, signature=self.signature, walkable=self.walkable,
+                 signed_distance=self.signed_distance, nearest_walkable_cell=self.nearest_walkable_cell)
+
+    def build(self) -> None:
+        width = self.world_mask.get_size()[0] // self.cell_size
+        height = self.world_mask.get_size()[1] // self.cell_size
+        half_cell = self.cell_size // 2
+
+        # A cell is walkable if its center pixel is, so the center of a walkable cell is always a safe spot.
+        # The mask is copied to a surface a band of rows at a time to read its pixels with numpy, all of it would take hundreds of MB.
+        self.walkable = np.zeros((width, height), dtype=bool)
+        band_cells = 32
+        band_mask = pygame.mask.Mask((width * self.cell_size, band_cells * self.cell_size))
+        band_surface = pygame.Surface(band_mask.get_size(), depth=32)
+        unset = band_surface.map_rgb((0, 0, 0))
+        for top in range(0, height, band_cells):
+            band_mask.clear()
+            band_mask.draw(self.world_mask, (0, -top * self.cell_size))
+            band_mask.to_surface(band_surface, setcolor=(255, 255, 255), unsetcolor=(0, 0, 0))
+            centers = pygame.surfarray.pixels2d(band_surface)[half_cell::self.cell_size, half_cell::self.cell_size]
+            rows = min(band_cells, height - top)
+            self.walkable[:, top:top + rows] = centers[:width, :rows] != unset
+            del centers
+
+        nearest_walkable, walkable_distance = jump_flood(self.walkable)
+        _, wall_distance = jump_flood(~self.walkable)
+        self.nearest_walkable_cell = nearest_walkable.astype(np.int16)
+        self.signed_distance = (np.where(self.walkable, wall_distance, -walkable_distance) * self.cell_size).astype(np.float32)
+
+    def cell_of(self, position: pygame.Vector2) -> tuple[int, int]:
+        """The cell containing `position`, clamped to the edges of the grid"""
+        x = min(max(int(position[0] // self.cell_size), 0), self.grid_size[0] - 1)
+        y = min(max(int(position[1] // self.cell_size), 0), self.grid_size[1] - 1)
+        return (x, y)
+
+    def cell_center(self, cell: tuple[int, int]) -> pygame.Vector2:
+        return pygame.Vector2(cell[0] * self.cell_size + self.cell_size // 2, cell[1] * self.cell_size + self.cell_size // 2)
+
+    def is_walkable(self, position: pygame.Vector2) -> bool:
+        """Exact, per pixel check of the world mask"""
+        try:
+            return bool(self.world_mask.get_at(position))
+        except IndexError:
+            # if the position is off the map
+            return False
+
+    def distance_to_wall(self, position: pygame.Vector2) -> float:
+        """Roughly how far `position` is from the edge of the walkable area, in px.
+        Negative if the position isn't walkable.
+        """
+        return float(self.signed_distance[self.cell_of(position)])
+
+    def nearest_walkable(self, position: pygame.Vector2) -> pygame.Vector2:
+        """Return `position` if it is walkable, otherwise the closest walkable spot to it"""
+        if self.is_walkable(position):
+            return pygame.Vector2(position)
+
+        cell = self.nearest_walkable_cell[self.cell_of(position)]
+        return self.cell_center((int(cell[0]), int(cell[1])))
+
+    def wall_normal(self, position: pygame.Vector2) -> pygame.Vector2:
+        """The direction pointing away from the nearest wall, or a zero vector in open space"""
+        x, y = self.cell_of(position)
+        left = self.signed_distance[max(x - 1, 0), y]
+        right = self.signed_distance[min(x + 1, self.grid_size[0] - 1), y]
+        up = self.signed_distance[x, max(y - 1, 0)]
+        down = self.signed_distance[x, min(y + 1, self.grid_size[1] - 1)]
+        normal = pygame.Vector2(float(right - left), float(down - up))
+        if normal.length_squared() > 0:
+            normal.normalize_ip()
+        return normal
+
+    def slide(self, position: pygame.Vector2, movement: pygame.Vector2) -> pygame.Vector2:
+        """Adjust `movement` so that moving into a wall slides along it instead of stopping.
+        Returns a zero vector if there is no way to move.
+        """
+        if self.is_walkable(position + movement):
+            return movement
+
+        # Take away the part of the movement going into the wall
+        normal = self.wall_normal(position + movement)
+        into_wall = movement.dot(normal)
+        if into_wall < 0:
+            slid_movement = movement - normal * into_wall
+            if self.is_walkable(position + slid_movement):
+                return slid_movement
+
+        return pygame.Vector2()
+
+    def cast_rays(self, origin: pygame.Vector2, angles: np.ndarray, max_distance: float, wall_depth: float = 0) -> np.ndarray:
+        """How far rays from `origin` go before they are `wall_depth` px into a wall (or off the map),
+        up to `max_distance`. `angles` are in radians, counter clockwise from the x axis like Light.
+
+        All the rays are marched together, each one stepping as far as the signed distance
+        says is safe, so open roads only take a few steps.
+        """
+        directions = np.stack((np.cos(angles), -np.sin(angles)), axis=1)
+        distances = np.zeros(len(angles))
+        active = np.arange(len(angles))
+        min_step = self.cell_size / 2
+        origin = np.array((origin[0], origin[1]))
+
+        while len(active):
+            points = origin + directions[active] * distances[active, np.newaxis]
+            cells = np.floor(points / self.cell_size).astype(np.intp)
+            on_map = ((cells[:, 0] >= 0) & (cells[:, 0] < self.grid_size[0]) &
+                      (cells[:, 1] >= 0) & (cells[:, 1] < self.grid_size[1]))
+            depth = np.full(len(active), -np.inf)
+            depth[on_map] = self.signed_distance[cells[on_map, 0], cells[on_map, 1]] + wall_depth
+
+            moving = (depth > 0) & (distances[active] < max_distance)
+            active = active[moving]
+            # The signed distance is measured between cell centers, so it can be a cell off
+            steps = np.maximum(depth[moving] - self.cell_size, min_step)
+            distances[active] = np.minimum(distances[active] + steps, max_distance)
+
+        return distances
+
+    def furthest_walkable(self, origin: pygame.Vector2, direction: pygame.Vector2, max_distance: float) -> pygame.Vector2:
+        """The furthest point up to `max_distance` from `origin` in `direction` (a unit vector)
+        that can be reached in a straight line without going through a wall.
+        Falls back to the nearest walkable spot if `origin` is inside a wall.
+        """
+        if not self.is_walkable(origin):
+            return self.nearest_walkable(origin)
+
+        # Step as far as the signed distance says is clear, like cast_rays. It is measured between
+        # cell centers, so keep two cells back from it, and go a pixel at a time right next to the wall.
+        target = pygame.Vector2(origin)
+        distance = 0.0
+        while distance < max_distance:
+            step = max(self.distance_to_wall(target) - 2 * self.cell_size, 1)
+            point = origin + direction * min(distance + step, max_distance)
+            if not self.is_walkable(point):
+                break
+            distance = min(distance + step, max_distance)
+            target = point
+        return target
+
+
+def shift(array: np.ndarray, dx: int, dy: int, fill) -> np.ndarray:
+    """Return an array where result[x, y] = array[x + dx, y + dy], using `fill` past the edges"""
+    width, height = array.shape[:2]
+    result = np.full_like(array, fill)
+    if abs(dx) >= width or abs(dy) >= height:
+        return result
+
+    result[max(0, -dx):width - max(0, dx), max(0, -dy):height - max(0, dy)] = \
+        array[max(0, dx):width + min(0, dx), max(0, dy):height + min(0, dy)]
+    return result
+
+def jump_flood(seeds: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """For every cell find the closest cell where `seeds` is True, using the jump flooding
+    algorithm. Returns an array of the closest cells' coordinates (shape (w, h, 2)) and
+    the distance to them in cells (infinite if there are no seeds at all).
+    """
+
+    width, height = seeds.shape
+    xs, ys = np.meshgrid(np.arange(width, dtype=np.int32), np.arange(height, dtype=np.int32), indexing='ij')
+    nearest = np.stack([np.where(seeds, xs, -1), np.where(seeds, ys, -1)], axis=-1)
+    best = np.where(seeds, 0.0, np.inf)
+
+    # Look at neighbors half as far away each pass, with one extra pass of 1 to clean up errors
+    steps = []
+    step = 1 << (max(width, height) - 1).bit_length()
+    while step >= 1:
+        step //= 2
+        steps.append(max(step, 1))
+
+    for step in steps:
+        for dx in (-step, 0, step):
+            for dy in (-step, 0, step):
+                if dx == 0 and dy == 0:
+                    continue
+                candidate = shift(nearest, dx, dy, -1)
+                valid = candidate[..., 0] >= 0
+                distance = (candidate[..., 0] - xs) ** 2 + (candidate[..., 1] - ys) ** 2
+                better = valid & (distance < best)
+                nearest[better] = candidate[better]
+                best[better] = distance[better]
+
+    return nearest, np.sqrt(best)
@@ -0,0 +1,212 @@
+import heapq
+import math
+from collections import OrderedDict
+
+import numpy as np
+import pygame
+
+from navigation import NavigationField, shift
+
+# (dx, dy, cost) of each step to a neighboring cell, the index of each is what FlowField.next_step holds
+NEIGHBORS = [(1, 0, 1.0), (-1, 0, 1.0), (0, 1, 1.0), (0, -1, 1.0),
+             (1, 1, math.sqrt(2)), (1, -1, math.sqrt(2)), (-1, 1, math.sqrt(2)), (-1, -1, math.sqrt(2))]
+STAY = len(NEIGHBORS)
+
+class FlowField:
+    """How far every cell within `radius` cells of the goal is from it, and which neighbor to step to
+    to get closer. It is built a few wavefront steps at a time with `step` so the work can be spread
+    over several frames.
+    """
+
+    def __init__(self, navigation: NavigationField, goal_cell: tuple[int, int], radius: int):
+        self.goal_cell = goal_cell
+        self.origin = (max(goal_cell[0] - radius, 0), max(goal_cell[1] - radius, 0))
+        end = (min(goal_cell[0] + radius + 1, navigation.grid_size[0]), min(goal_cell[1] + radius + 1, navigation.grid_size[1]))
+
+        self.blocked = ~navigation.walkable[self.origin[0]:end[0], self.origin[1]:end[1]]
+        local_goal = (goal_cell[0] - self.origin[0], goal_cell[1] - self.origin[1])
+        # The player can stand in a cell whose center isn't walkable, it still has to be reachable
+        self.blocked[local_goal] = False
+
+        # The cost of stepping to each neighbor from every cell. Diagonal steps can't cut the corner
+        # of a wall or squeeze between two walls that touch at a corner, those are infinite.
+        self.step_costs = []
+        for dx, dy, cost in NEIGHBORS:
+            step_cost = np.full(self.blocked.shape, cost)
+            if dx != 0 and dy != 0:
+                step_cost[shift(self.blocked, dx, 0, True) | shift(self.blocked, 0, dy, True)] = np.inf
+            self.step_costs.append(step_cost)
+
+        self.distance = np.full(self.blocked.shape, np.inf)
+        self.distance[local_goal] = 0.0
+        self.next_step = None
+        self.done = False
+
+    def step(self, iterations: int) -> bool:
+        """Spread the distances out by up to `iterations` cells, returns True once they've stopped changing"""
+        for _ in range(iterations):
+            new_distance = self.distance.copy()
+            for (dx, dy, _), step_cost in zip(NEIGHBORS, self.step_costs):
+                np.minimum(new_distance, shift(self.distance, dx, dy, np.inf) + step_cost, out=new_distance)
+            new_distance[self.blocked] = np.inf
+
+            changed = (new_distance < self.distance).any()
+            self.distance = new_distance
+            if not changed:
+                self.finish()
+                return True
+
+        return False
+
+    def finish(self) -> None:
+        """Work out which way to step from every cell, so following the field is a lookup"""
+        costs = np.array([cost for _, _, cost in NEIGHBORS])
+        candidates = np.stack([shift(self.distance, dx, dy, np.inf) + step_cost for (dx, dy, _), step_cost in zip(NEIGHBORS, self.step_costs)])
+        best = np.argmin(candidates, axis=0)
+        # Only step if the neighbor is actually closer, cells that can't reach the goal stay put
+        best_distance = np.take_along_axis(candidates, best[np.newaxis], axis=0)[0] - costs[best]
+        improves = best_distance < self.distance
+        self.next_step = np.where(improves, best, STAY).astype(np.int8)
+        self.done = True
+
+    def local_cell(self, cell: tuple[int, int]) -> tuple[int, int] | None:
+        x, y = cell[0] - self.origin[0], cell[1] - self.origin[1]
+        if 0 <= x < self.distance.shape[0] and 0 <= y < self.distance.shape[1]:
+            return (x, y)
+        return None
+
+class Pathfinder:
+    """Finds ways around the walls for the creatures.
+
+    Every seeking creature is chasing the player, so instead of a path per
+    creature there is one flow field leading to the player that they all
+    follow. It is replanned at most every `replan_interval` seconds, and
+    only if the player has moved to another cell, with the work split over
+    frames. For one-off trips there is `find_path`, which caches its results.
+    """
+
+    def __init__(self, navigation: NavigationField, field_radius: float = 400, replan_interval: float = 0.25,
+                 steps_per_frame: int = 16, lookahead: int = 3, max_cached_paths: int = 64):
+        self.navigation = navigation
+        self.field_radius = int(field_radius // navigation.cell_size)
+        self.replan_interval = replan_interval
+        self.steps_per_frame = steps_per_frame
+        # How many cells ahead creatures aim for, to smooth out the zig-zags of the grid
+        self.lookahead = lookahead
+
+        self.flow_field: FlowField | None = None
+        self.pending_field: FlowField | None = None
+        self.replan_timer = 0
+
+        self.path_cache: OrderedDict[tuple, list[pygame.Vector2] | None] = OrderedDict()
+        self.max_cached_paths = max_cached_paths
+        # Cells within a couple of cells of a wall cost more to cross in find_path, so paths stay in the middle of the road
+        wall_margin = 2 * navigation.cell_size
+        self.wall_penalty = np.maximum(0.0, wall_margin - navigation.signed_distance) / navigation.cell_size
+
+    def update(self, delta: float, goal: pygame.Vector2) -> None:
+        """Keep the flow field leading to `goal` up to date, call once a frame while anything is following it"""
+        self.replan_timer -= delta
+        goal_cell = self.navigation.cell_of(goal)
+        if self.pending_field is None and self.replan_timer <= 0:
+            if self.flow_field is None or self.flow_field.goal_cell != goal_cell:
+                self.pending_field = FlowField(self.navigation, goal_cell, self.field_radius)
+                self.replan_timer = self.replan_interval
+
+        if self.pending_field is not None and self.pending_field.step(self.steps_per_frame):
+            self.flow_field = self.pending_field
+            self.pending_field = None
+
+    def steer_target(self, position: pygame.Vector2, goal: pygame.Vector2) -> pygame.Vector2:
+        """Where a creature at `position` should head to get to `goal` along the roads.
+        The point is as far away as the goal is along the path, so creatures keep the same speed as
+        when they head straight for it. Falls back to `goal` itself when the field doesn't help.
+        """
+        field = self.flow_field
+        if field is None:
+            return goal.copy()
+
+        cell = field.local_cell(self.navigation.cell_of(position))
+        if cell is None or not math.isfinite(field.distance[cell]):
+            return goal.copy()
+
+        path_distance = field.distance[cell] * self.navigation.cell_size
+        for _ in range(self.lookahead):
+            direction = field.next_step[cell]
+            if direction == STAY:
+                break
+            cell = (cell[0] + NEIGHBORS[direction][0], cell[1] + NEIGHBORS[direction][1])
+
+        if cell == field.local_cell(field.goal_cell):
+            # Close enough that there's nothing in the way
+            return goal.copy()
+
+        heading = self.navigation.cell_center((cell[0] + field.origin[0], cell[1] + field.origin[1])) - position
+        if heading.length_squared() == 0:
+            return goal.copy()
+        return position + heading.normalize() * path_distance
+
+    def find_path(self, start: pygame.Vector2, goal: pygame.Vector2) -> list[pygame.Vector2] | None:
+        """A* search from `start` to `goal`, returning the center of every cell along the way
+        followed by the goal itself, or None if it can't be reached.
+        Paths keep away from walls where there's room to.
+        """
+        start_cell = self.walkable_cell(start)
+        goal_cell = self.walkable_cell(goal)
+        key = (start_cell, goal_cell)
+        if key in self.path_cache:
+            self.path_cache.move_to_end(key)
+            path = self.path_cache[key]
+        else:
+            path = self.search(start_cell, goal_cell)
+            self.path_cache[key] = path
+            if len(self.path_cache) > self.max_cached_paths:
+                self.path_cache.popitem(last=False)
+
+        if path is None:
+            return None
+        return [point.copy() for point in path] + [pygame.Vector2(goal)]
+
+    def walkable_cell(self, position: pygame.Vector2) -> tuple[int, int]:
+        cell = self.navigation.cell_of(position)
+        if not self.navigation.walkable[cell]:
+            cell = tuple(int(coord) for coord in self.navigation.nearest_walkable_cell[cell])
+        return cell
+
+    def search(self, start_cell: tuple[int, int], goal_cell: tuple[int, int]) -> list[pygame.Vector2] | None:
+        walkable = self.navigation.walkable
+        grid_width, grid_height = self.navigation.grid_size
+        wall_penalty = self.wall_penalty
+
+        def heuristic(cell):
+            dx = abs(cell[0] - goal_cell[0])
+            dy = abs(cell[1] - goal_cell[1])
+            return max(dx, dy) + (math.sqrt(2) - 1) * min(dx, dy)
+
+        came_from = {start_cell: None}
+        cost_so_far = {start_cell: 0.0}
+        frontier = [(heuristic(start_cell), start_cell)]
+        while frontier:
+            _, cell = heapq.heappop(frontier)
+            if cell == goal_cell:
+                path = []
+                while cell is not None:
+                    path.append(self.navigation.cell_center(cell))
+                    cell = came_from[cell]
+                path.reverse()
+                return path
+
+            for dx, dy, cost in NEIGHBORS:
+                neighbor = (cell[0] + dx, cell[1] + dy)
+                if not (0 <= neighbor[0] < grid_width and 0 <= neighbor[1] < grid_height) or not walkable[neighbor]:
+                    continue
+                # Same as the flow field, no cutting through the corners of walls
+                if dx != 0 and dy != 0 and not (walkable[neighbor[0], cell[1]] and walkable[cell[0], neighbor[1]]):
+                    continue
+                new_cost = cost_so_far[cell] + cost * (1 + wall_penalty[neighbor])
+                if new_cost < cost_so_far.get(neighbor, math.inf):
+                    cost_so_far[neighbor] = new_cost
+                    came_from[neighbor] = cell
+                    heapq.heappush(frontier, (new_cost + heuristic(neighbor), neighbor))
+
+        return None
@@ -1,4 +1,3 @@
-import glob
 import math
 
 import pygame
@@ -19,13 +18,10 @@ class Player(entity.Entity):
         self.animations = {}
         self.current_animation = None
 
-        path_start = "assets/imgs/Player/"
-        for fname in glob.iglob(path_start + "*.png"):
-            ImageLoader.ImageLoader.GetImage(fname, alpha=True) # Cache all the images
-
-        self.animations['falling'] = ImageLoader.ImageLoader.return_image_set("player_fall", None, True)
-        self.animations['biking'] = ImageLoader.ImageLoader.return_image_set("player_biking", None, True)
-        self.animations['walking'] = ImageLoader.ImageLoader.return_image_set("player_walking", None, True)
+        ImageLoader.ImageLoader.IndexAnimations("assets/imgs/Player")
+        self.animations['falling'] = ImageLoader.ImageLoader.GetAnimation("player_fall", alpha=True)
+        self.animations['biking'] = ImageLoader.ImageLoader.GetAnimation("player_biking", alpha=True)
+        self.animations['walking'] = ImageLoader.ImageLoader.GetAnimation("player_walking", alpha=True)
         self.current_animation = self.animations['biking']
         self.time_between_animation_frames = 100
     
@@ -0,0 +1,197 @@
+"""Recording the input of a game so it can be played back exactly, to reproduce slow frames.
+
+A replay holds the World's random seed and, for every frame, the keys held
+down and delta of each simulation step in it, how far between steps it was
+drawn (the FramePacer's alpha) and whether it was drawn at all. Playing one
+back simulates exactly the same frames.
+
+    replay: magic (4 bytes), version (u16), flags (u16), seed (u64), then frames until the end
+    frame: step count (u8), frame flags (u8), alpha (f32), then that many steps
+    step: keys held down (u8, a bit for each of RECORDED_KEYS), delta (f32)
+
+The whole file is gzipped, the steps are nearly all the same so it shrinks a lot.
+
+Record a game with `python main.py --record FILE` and watch it with `python main.py --replay FILE`,
+or play it back headless with timings for every frame with: python replay.py FILE
+"""
+
+import argparse
+import gzip
+import os
+import struct
+import sys
+import time
+from typing import NamedTuple
+
+MAGIC = b"GTRP"
+VERSION = 1
+HEADER = struct.Struct("<4sHHQ")
+FRAME = struct.Struct("<BBf")
+STEP = struct.Struct("<Bf")
+
+# Replay flags
+DIRTY_RENDERING = 1
+# Frame flags
+DRAWN = 1
+
+class ReplayFormatError(Exception):
+    pass
+
+def get_recorded_keys() -> tuple[int, ...]:
+    # pygame is only imported once it's needed, so the headless player below can set up SDL first
+    import pygame
+    return (pygame.K_w, pygame.K_a, pygame.K_s, pygame.K_d, pygame.K_SPACE)
+
+class RecordedKeys:
+    """Stands in for pygame.key.get_pressed() when handing recorded keys to World.handle_input"""
+
+    def __init__(self, bits: int):
+        self.bits = bits
+        self.recorded_keys = get_recorded_keys()
+
+    def __getitem__(self, key: int) -> bool:
+        return key in self.recorded_keys and bool(self.bits & (1 << self.recorded_keys.index(key)))
+
+def pack_keys(pressed_keys) -> int:
+    """The bits for the keys the World cares about in `pressed_keys`"""
+    bits = 0
+    for idx, key in enumerate(get_recorded_keys()):
+        if pressed_keys[key]:
+            bits |= 1 << idx
+    return bits
+
+class ReplayFrame(NamedTuple):
+    # (keys, delta) for each step
+    steps: list[tuple[RecordedKeys, float]]
+    alpha: float
+    drawn: bool
+
+class ReplayRecorder:
+    """Writes a replay as the game is played, call `record_step` for every simulation step
+    and `end_frame` once the frame is done"""
+
+    def __init__(self, path: str, seed: int, dirty_rendering: bool = False):
+        self.file = gzip.open(path, 'wb')
+        self.file.write(HEADER.pack(MAGIC, VERSION, DIRTY_RENDERING if dirty_rendering else 0, seed))
+        self.steps = []
+        self.frame_count = 0
+
+    def record_step(self, pressed_keys, delta: float) -> None:
+        self.steps.append(STEP.pack(pack_keys(pressed_keys), delta))
+
+    def end_frame(self, alpha: float, drawn: bool = True) -> None:
+        # More steps than fit in a byte never happen with the FramePacer's max_steps, but split them up just in case
+        while len(self.steps) > 255:
+            self.file.write(FRAME.pack(255, 0, 1.0) + b"".join(self.steps[:255]))
+            self.steps = self.steps[255:]
+        self.file.write(FRAME.pack(len(self.steps), DRAWN if drawn else 0, alpha) + b"".join(self.steps))
+        self.steps = []
+        self.frame_count += 1
+
+    def close(self) -> None:
+        self.file.close()
+
+class Replay:
+    """A replay read back from a file"""
+
+    def __init__(self, path: str):
+        with gzip.open(path, 'rb') as f:
+            data = f.read()
+        if len(data) < HEADER.size:
+            raise ReplayFormatError(f"`{path}` is not a replay")
+        magic, version, flags, self.seed = HEADER.unpack_from(data, 0)
+        if magic != MAGIC:
+            raise ReplayFormatError(f"`{path}` is not a replay")
+        if version != VERSION:
+            raise ReplayFormatError(f"`{path}` is replay version {version}, expected {VERSION}")
+        self.dirty_rendering = bool(flags & DIRTY_RENDERING)
+
+        self.frames: list[ReplayFrame] = []
+        offset = HEADER.size
+        while offset < len(data):
+            if offset + FRAME.size > len(data):
+                raise ReplayFormatError(f"`{path}` is truncated")
+            step_count, frame_flags, alpha = FRAME.unpack_from(data, offset)
+            offset += FRAME.size
+            if offset + step_count * STEP.size > len(data):
+                raise ReplayFormatError(f"`{path}` is truncated")
+            steps = []
+            for _ in range(step_count):
+                bits, delta = STEP.unpack_from(data, offset)
+                steps.append((RecordedKeys(bits), delta))
+                offset += STEP.size
+            self.frames.append(ReplayFrame(steps, alpha, bool(frame_flags & DRAWN)))
+
+        self.next_frame_index = 0
+
+    def __len__(self) -> int:
+        return len(self.frames)
+
+    def next_frame(self) -> ReplayFrame | None:
+        """The next frame to play back, or None once they've all been played"""
+        if self.next_frame_index >= len(self.frames):
+            return None
+        self.next_frame_index += 1
+        return self.frames[self.next_frame_index - 1]
+
+def run():
+    parser = argparse.ArgumentParser(description="Play a replay back without a window and report how long each frame took")
+    parser.add_argument("path")
+    parser.add_argument("--slowest", type=int, default=10, help="how many of the slowest frames to list")
+    parser.add_argument("--profile", metavar="FIRST:LAST", help="run cProfile over this range of frames")
+    args = parser.parse_args()
+
+    # Same as the benchmark, this has to happen before pygame and helpers are imported
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+    replay_path = os.path.abspath(args.path)
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+    import pygame
+    import benchmark
+    import helpers
+    import world
+    from gametools.profiling import FrameProfiler
+
+    replay = Replay(replay_path)
+    pygame.init()
+    screen = pygame.display.set_mode(helpers.SCREEN_SIZE)
+    game_world = world.World(dirty_rendering=replay.dirty_rendering, seed=replay.seed)
+
+    profile_range = None
+    if args.profile:
+        first, last = (int(frame) for frame in args.profile.split(":"))
+        profile_range = (first, last)
+    profiler = FrameProfiler()
+
+    timer = game_world.timer
+    timer.history_length = len(replay)
+    timer.reset()
+    frame_times = []
+    for frame_index, frame in enumerate(replay.frames):
+        if profile_range is not None and frame_index == profile_range[0]:
+            profiler.start(profile_range[1] - profile_range[0] + 1)
+
+        start = time.perf_counter()
+        for pressed_keys, delta in frame.steps:
+            with timer.phase("input"):
+                game_world.handle_input(pressed_keys)
+            with timer.phase("update"):
+                game_world.update(delta)
+        if frame.drawn:
+            game_world.draw(screen, frame.alpha)
+        frame_times.append((time.perf_counter() - start, frame_index, len(frame.steps)))
+        timer.end_frame()
+        profiler.end_frame()
+
+    benchmark.print_report(os.path.basename(replay_path), game_world)
+    print(f"  slowest frames:")
+    for seconds, frame_index, steps in sorted(frame_times, reverse=True)[:args.slowest]:
+        print(f"    frame {frame_index:>6}: {seconds * 1000:8.3f} ms, {steps} steps")
+    if profiler.last_path is not None:
+        print(f"  profile saved to {profiler.last_path}.prof")
+
+    pygame.quit()
+
+if __name__ == "__main__":
+    sys.exit(run())
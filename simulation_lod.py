@@ -0,0 +1,49 @@
+import pygame
+
+from gametools.spatial_hash import SpatialHash
+
+class SimulationLOD:
+    """Decides how often entities are simulated based on how far they are from the player.
+
+    - Within `active_radius` (which should cover the screen) entities update every frame.
+    - Between `active_radius` and `wake_radius` they update every `reduced_interval`
+      seconds, with all the time that has passed since their last update.
+    - Beyond `wake_radius` they are dormant and don't update at all. They wake up as soon
+      as a spatial query finds them within `wake_radius` again.
+    """
+
+    def __init__(self, active_radius: float = 800, wake_radius: float = 1200, reduced_interval: float = 1 / 20):
+        self.active_radius = active_radius
+        self.wake_radius = wake_radius
+        self.reduced_interval = reduced_interval
+
+        # Time that has passed since each reduced rate entity last updated
+        self.pending_time: dict[object, float] = {}
+
+        # How many entities were in each tier last frame, for debugging
+        self.active_count = 0
+        self.reduced_count = 0
+
+    def entities_to_update(self, index: SpatialHash, position: pygame.Vector2, delta: float) -> list[tuple[object, float]]:
+        """Return the entities from `index` that should update this frame, along with the delta they should use"""
+        active_radius_squared = self.active_radius * self.active_radius
+        to_update = []
+        pending_time = {}
+        self.active_count = 0
+        self.reduced_count = 0
+        for entity in index.query_radius(position, self.wake_radius):
+            entity_delta = self.pending_time.get(entity, 0) + delta
+            if position.distance_squared_to(entity.position) < active_radius_squared:
+                self.active_count += 1
+                to_update.append((entity, entity_delta))
+                continue
+
+            self.reduced_count += 1
+            if entity_delta >= self.reduced_interval:
+                to_update.append((entity, entity_delta))
+            else:
+                pending_time[entity] = entity_delta
+
+        # Anything that wasn't found is dormant and forgets how long it has been waiting
+        self.pending_time = pending_time
+        return to_update
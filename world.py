@@ -1,6 +1,6 @@
-from ast import literal_eval
 from lzma import is_check_supported
 import math
+import os
 import glob
 import random
 
@@ -10,15 +10,54 @@ import player
 import entity
 import light
 import creature
+import creature_physics
+import creature_states
+import fog
+import level_data
+import lighting
+import navigation
+import pathfinding
+import simulation_lod
 
 import camera
 import helpers
 
-from gametools import ImageLoader
+from gametools import ImageLoader, atlas
+from gametools.asset_loader import AssetLoader
+from gametools.dirty_rects import DirtyRects
+from gametools.sound_manager import SoundManager
+from gametools.spatial_audio import SpatialAudio
+from gametools.profiling import PhaseTimer
+from gametools.spatial_hash import SpatialHash
+from gametools.tiled_image import TiledImage
+
+# The walkable parts of the map are the black pixels of the mask
+MASK_PATH = "assets/imgs/TheMapMask.png"
+MASK_THRESHOLD = ((0, 0, 0, 255), (10, 10, 10, 255))
+
+# The animation frames and props are packed into one atlas image, which is rebuilt whenever they change
+SPRITE_FOLDERS = ["assets/imgs/Creature", "assets/imgs/Player", "assets/imgs/Props"]
+ATLAS_PATH = "assets/cache/atlas/sprites"
+
+# Sound effects that have to play right away are kept decoded, and the long ambient voices are
+# streamed from their files. See SoundManager
+RESIDENT_SOUNDS = ("player_hurt",)
+STREAMED_SOUNDS = ("voice_slowrev",)
+# Every this many seconds one of the creatures within earshot growls
+GROWL_INTERVAL = 2.5
+
+# Shows around the edges of the map
+BACKGROUND_COLOR = (50, 25, 15)
 
 class World:
 
-    def __init__(self):
+    def __init__(self, batch_creature_physics: bool = True, dirty_rendering: bool = False, seed: int | None = None):
+        # Everything random in the game comes from here, so a replay with the same seed and input plays out the same
+        self.seed = seed if seed is not None else random.randrange(2**32)
+        self.random = random.Random(self.seed)
+
+        ImageLoader.ImageLoader.UseAtlas(SPRITE_FOLDERS, ATLAS_PATH)
+
         self.camera = camera.Camera(pygame.Vector2())
 
         self.player_sprite = player.Player(pygame.Vector2(250, 250), self)
@@ -28,25 +67,34 @@ class World:
         self.light_group = pygame.sprite.Group(self.player_headlight)
         self.player_sprite.add_child(self.player_headlight)
 
-        self.world_background = ImageLoader.ImageLoader.GetImage("assets/imgs/TheMap.png")
-        self.world_mask_img = ImageLoader.ImageLoader.GetImage("assets/imgs/TheMapMask.png")
-        self.world_mask = pygame.mask.from_threshold(self.world_mask_img, (0, 0, 0, 255), threshold=(10, 10, 10, 255))
+        # The map is far too large to keep in memory as one image, only the tiles near the camera are loaded
+        self.world_background = TiledImage("assets/imgs/TheMap.png")
+        self.world_mask = ImageLoader.ImageLoader.GetMask(MASK_PATH, *MASK_THRESHOLD)
+        # Distances to the walls and the closest walkable spots, so we don't have to probe the mask over and over
+        self.navigation = navigation.NavigationField(self.world_mask, MASK_PATH)
+        self.pathfinder = pathfinding.Pathfinder(self.navigation)
+        # Street lamps and any other lights besides the headlight
+        self.lighting = lighting.Lighting(self.navigation)
 
         self.other_entity_group = pygame.sprite.Group()
-        # Later the monsters will be placed intentionally, random locations for now to test
-        with open("mapdata.txt") as f:
-            for line in f:
-                prop_type, prop_coord = literal_eval(line)
-                if prop_type == 'Creature':
-                    coord = pygame.Vector2(prop_coord)
-                    creature_sprite = creature.Creature(coord, self)
-                    self.other_entity_group.add(creature_sprite)
+        # Used to find the entities near a point without checking every one of them
+        self.entity_index = SpatialHash()
+        self.simulation_lod = simulation_lod.SimulationLOD()
+        # Moves all the creatures at once, much faster than updating them one by one when there are hundreds
+        self.creature_physics = creature_physics.CreaturePhysics() if batch_creature_physics else None
+        self.entities_near_player = set()
+        self.lit_entities = set()
+        # Props that don't move or interact with anything, like trees
+        self.prop_entities = pygame.sprite.Group()
+        self.prop_index = SpatialHash()
+        self.load_level("mapdata.lvl")
 
         self.scenery_entities = pygame.sprite.Group()
         self.player_scenery_sprite = None
         self.bike_scenery_sprite = None
         self.player_in_animation = False
 
+        self.fog = fog.Fog()
         self.fog_timer = 0
         self.sound_timer = 0
 
@@ -61,37 +109,102 @@ class World:
 
         self.won = False
 
+        # Keeps track of how long each part of a frame takes
+        self.timer = PhaseTimer()
+
+        # Only redraw the parts of the screen that changed while the camera stands still
+        self.dirty_rects = DirtyRects(pygame.Rect((0, 0), helpers.SCREEN_SIZE)) if dirty_rendering else None
+        self.last_camera_state = None
+
+        # Where the entities that moved in the last update were before it, so drawing can
+        # interpolate between the last two updates. See World.draw's `alpha`.
+        self.previous_positions: dict[entity.Entity, pygame.Vector2] = {}
+        self.previous_camera_position = self.camera.position.copy()
+        self.render_alpha = 1.0
+
+        # How many sprites were blitted and how many were skipped for being off the screen last frame
+        self.drawn_count = 0
+        self.culled_count = 0
+
+    @staticmethod
+    def queue_assets(loader: AssetLoader) -> None:
+        """Queue up everything a World loads when it is created, so it can be loaded in the background
+        before the World is created. Anything that isn't preloaded is still loaded when it's needed.
+        """
+        # Cutting the map into tiles only happens the first time the game is run, but takes a while
+        loader.queue_task("assets/imgs/TheMap.png", lambda: TiledImage("assets/imgs/TheMap.png"))
+
+        def load_mask():
+            mask = ImageLoader.ImageLoader.CreateMask(MASK_PATH, *MASK_THRESHOLD)
+            # Same with the navigation field, which is saved next to the mask
+            navigation.NavigationField(mask, MASK_PATH)
+            return mask
+        if (MASK_PATH, *MASK_THRESHOLD) not in ImageLoader.ImageLoader.loaded_masks_cache:
+            loader.queue_task(MASK_PATH, load_mask, lambda mask: ImageLoader.ImageLoader.AddMask(MASK_PATH, *MASK_THRESHOLD, mask))
+
+        # The atlas is rebuilt on the worker if any of the frames changed, only converting it happens on the main thread
+        def load_atlas():
+            if not atlas.is_atlas_current(SPRITE_FOLDERS, ATLAS_PATH):
+                atlas.build_atlas(SPRITE_FOLDERS, ATLAS_PATH)
+            return ImageLoader.ImageLoader.LoadDecodedImage(ATLAS_PATH + ".png")
+        if ATLAS_PATH not in ImageLoader.ImageLoader.loaded_atlases:
+            loader.queue_task(ATLAS_PATH, load_atlas,
+                              lambda decoded_atlas: ImageLoader.ImageLoader.UseAtlas(SPRITE_FOLDERS, ATLAS_PATH, decoded_atlas))
+        # Every image in the folders ends up in the atlas, even if it hasn't been rebuilt yet
+        in_atlas = set(atlas.source_paths(SPRITE_FOLDERS))
+
+        loader.queue_image("assets/imgs/BikePlayer.png", alpha=True)
+        loader.queue_image("assets/imgs/bike.png")
+        loader.queue_image("assets/imgs/Props/Grandma.png")
+        for folder in ("assets/imgs/Player", "assets/imgs/Creature"):
+            ImageLoader.ImageLoader.IndexAnimations(folder)
+        frame_paths = [path for paths in ImageLoader.ImageLoader.animation_index.values() for path in paths]
+        for path in frame_paths + list(level_data.PROP_IMAGES.values()):
+            if path not in in_atlas:
+                loader.queue_image(path, alpha=True)
+
+        # Everything but the long ambient voices is decoded up front, the first ambient sound plays as soon as
+        # the game starts and would be skipped if it was still decoding. The long voices are streamed.
+        SoundManager.InitMixer()
+        for path in glob.glob("assets/sound/*.ogg"):
+            name = os.path.splitext(os.path.basename(path))[0]
+            if name.startswith(RESIDENT_SOUNDS) or not name.startswith(STREAMED_SOUNDS):
+                loader.queue_sound(path)
+
+    def load_level(self, path: str) -> None:
+        """Place the monsters and props saved in a level file by the map editor"""
+        for record in level_data.load_level(path):
+            coord = pygame.Vector2(record.x, record.y)
+            if record.prop_type == 'Creature':
+                # Make sure monsters aren't stuck inside a wall if they were placed a little off the road
+                coord = self.navigation.nearest_walkable(coord)
+                self.add_entity(creature.Creature(coord, self))
+            else:
+                prop_image = ImageLoader.ImageLoader.GetImage(level_data.PROP_IMAGES[record.prop_type], alpha=True)
+                prop = entity.SceneryEntity(coord, prop_image, self)
+                self.prop_entities.add(prop)
+                self.prop_index.insert(prop)
+                if record.prop_type == 'StreetLamp':
+                    self.lighting.add(lighting.PointLight(coord, int(record.params[0]) or level_data.DEFAULT_LIGHT_RADIUS))
+
     def init_sounds(self) -> None:
-        """Load sounds from the disc and create our library of sounds"""
-        pygame.mixer.init()
-        self.sound_library: dict[str, pygame.mixer.Sound] = {}
+        """Set up our library of sounds, only the short sound effects are loaded right away"""
+        self.sounds = SoundManager("assets/sound", resident=RESIDENT_SOUNDS, streamed=STREAMED_SOUNDS)
 
-        path_start = "assets/sound/"
-        for fname in glob.iglob(path_start + "*.ogg"):
-            sound_name = fname[len(path_start):-4]
-            self.sound_library[sound_name] = pygame.mixer.Sound(fname)
+        # Create some lists of the names ahead of time if we want to play from a random subset of sounds
+        self.hurt_noises = self.sounds.names("player_hurt")
+        self.ambient_noises = self.sounds.names("voice")
+        self.growl_noises = self.sounds.names("growl")
+        # The short voices and growls are already decoded if queue_assets was used, otherwise start decoding them
+        self.sounds.preload(self.ambient_noises + self.growl_noises)
 
-        # Create some lists of the keys ahead of time if we want to play from a random subset of sounds
-        self.hurt_noises = [key for key in self.sound_library if "player_hurt" in key]
-        self.ambient_noises = [key for key in self.sound_library if "voice" in key]
+        # Growls and hurt noises come from somewhere in the world, and share a few channels
+        self.audio = SpatialAudio()
+        self.growl_timer = GROWL_INTERVAL
 
     def create_fog_images(self) -> None:
-        """Create images that will be used to mask the screen and obscure the players' vision"""
-
-        # self.fog_image will act as a mask, and we will subtract from it what the player CAN see
-        self.fog_image = pygame.Surface(helpers.SCREEN_SIZE, pygame.SRCALPHA)
-        self.fog_image.fill((0, 0, 0))
-
-        # Draw the shrinking ambient light
-        view_image = pygame.Surface(helpers.SCREEN_SIZE, pygame.SRCALPHA)
-        pygame.draw.circle(view_image, (255, 255, 255, 5), helpers.CENTER, 400 - self.fog_timer)
-        pygame.draw.circle(view_image, (255, 255, 255, 127), helpers.CENTER, 200 - self.fog_timer)
-        pygame.draw.circle(view_image, (255, 255, 255, 255), helpers.CENTER, 175 - self.fog_timer)
-
-        # Add player light to view image
-        light_rect = self.player_headlight.rect.copy()
-        light_rect.center = helpers.CENTER
-        view_image.blit(self.player_headlight.image, light_rect)
+        """Update the image that will be used to mask the screen and obscure the players' vision"""
+        self.fog.update(self.fog_timer, self.player_headlight, self.lighting.screen_lights(self.camera))
 
         # Wanted to get just the eyes to show, TODO: Fix glow
         # for sprite in self.other_entity_group:
@@ -99,14 +212,16 @@ class World:
         #     new_rect.center = self.camera.world_to_screen(pygame.Vector2(new_rect.center))
         #     view_image.blit(sprite.image, new_rect)
 
-        self.fog_image.blit(view_image, (0, 0), special_flags=pygame.BLEND_RGBA_SUB)
-
-    def handle_input(self) -> None:
-        """Handle input of the player holding down keys or buttons"""
+    def handle_input(self, pressed_keys=None) -> None:
+        """Handle input of the player holding down keys or buttons.
+        `pressed_keys` can be passed in to use something other than the keyboard,
+        it only needs to support `pressed_keys[key]` like pygame.key.get_pressed()
+        """
         self.player_acceleration = pygame.Vector2()
         self.player_rotation = 0
 
-        pressed_keys = pygame.key.get_pressed()
+        if pressed_keys is None:
+            pressed_keys = pygame.key.get_pressed()
         if pressed_keys[pygame.K_a]:
             # Rotate clockwise one rad/s
             self.player_rotation += helpers.RAD_TO_DEG
@@ -129,6 +244,9 @@ class World:
 
     def update(self, delta: float) -> None:
         """Update the position and states of all entities in the game"""
+        self.previous_camera_position = self.camera.position.copy()
+        self.previous_positions = {sprite: sprite.position.copy() for group in (self.player_group, self.light_group, self.scenery_entities)
+                                   for sprite in group}
 
         # Player objects, if the player is in an animation don't update their normal class
         self.scenery_entities.update(delta)
@@ -147,6 +265,11 @@ class World:
             # The player wins if they get close enough to grandma
             if (self.grandma_position - self.player_sprite.position).length_squared() < 80 * 80:
                 self.other_entity_group.empty()
+                self.entity_index.clear()
+                if self.creature_physics is not None:
+                    self.creature_physics.clear()
+                self.entities_near_player.clear()
+                self.lit_entities.clear()
                 self.won = True
             # self.lock_to_mask(self.world_mask_img)
 
@@ -156,95 +279,249 @@ class World:
         player_collision_radius = 16
         enemy_collision_radius = 16
 
-        # Update every monster or other entity.
-        for other_entity in self.other_entity_group:
-            player_offset: pygame.Vector2 = self.player_sprite.position - other_entity.position
-            player_offset_normalize = player_offset.normalize()
+        # Creatures close enough to notice the player, used by CreatureStateWaiting
+        self.entities_near_player = set(self.entity_index.query_radius(self.player_sprite.position, creature_states.SEEK_DISTANCE))
+        # Only keep the path to the player up to date while there's something that might chase them
+        if self.entities_near_player:
+            self.pathfinder.update(delta, self.player_sprite.position)
+
+        # Update the monsters and other entities near the player, far away ones are left dormant.
+        to_update = self.simulation_lod.entities_to_update(self.entity_index, self.player_sprite.position, delta)
+        batched = []
+        for other_entity, entity_delta in to_update:
+            self.previous_positions[other_entity] = other_entity.position.copy()
+            if self.creature_physics is not None and other_entity in self.creature_physics:
+                other_entity.think(entity_delta)
+                batched.append((other_entity, entity_delta))
+            else:
+                other_entity.update(entity_delta)
+        if self.creature_physics is not None:
+            self.creature_physics.step(batched, self.camera.view_rect(margin=128))
+        for other_entity, _ in to_update:
+            self.entity_index.update(other_entity)
+
+        # Only the entities in the headlight's cone or under another light near the screen are revealed
+        headlight = self.player_headlight
+        light_area = pygame.Rect(headlight.position.x - headlight.radius, headlight.position.y - headlight.radius, headlight.radius * 2, headlight.radius * 2)
+        lit_entities = set(headlight.entities_in_light(self.entity_index.query_rect(light_area)))
+        if len(self.lighting):
+            lit_entities |= self.lighting.entities_in_light(self.entity_index, self.camera.view_rect(margin=128))
+        for other_entity in self.lit_entities - lit_entities:
+            other_entity.visible = False
+        for other_entity in lit_entities:
+            other_entity.visible = True
+        self.lit_entities = lit_entities
 
-            other_entity.update(delta)
-            visible = self.player_headlight.in_light(other_entity.position)
-            other_entity.visible = visible
-
-            if not self.player_in_animation and player_offset.magnitude_squared() < (player_collision_radius + enemy_collision_radius) ** 2:
+        if not self.player_in_animation:
+            colliding = self.entity_index.query_radius(self.player_sprite.position, player_collision_radius + enemy_collision_radius)
+            if colliding:
                 if not self.player_sprite.on_bike:
                     # Player loses if they are hit by a monster while knocked off their bike
                     self.player_sprite.kill()
                     return
-                    
-                sound_choice = random.choice(self.hurt_noises)
-                self.sound_library[sound_choice].play()
-
-                self.player_sprite.on_bike = False
-                other_entity.kill()
-
-                self.player_scenery_sprite = entity.SceneryEntity(self.player_sprite.position.copy(), None, self)
-                dist = 100
-                player_target = self.player_sprite.position + player_offset_normalize * dist
-                while not self.is_coord_in_mask(player_target):
-                    dist /= 2
-                    player_target = self.player_sprite.position + player_offset_normalize * dist
-                self.player_scenery_sprite.add_keyframe(player_target, 2.0)
-                self.player_scenery_sprite.add_animation('falling', self.player_sprite.animations['falling'])
-                self.player_scenery_sprite.set_animation('falling')
-                self.scenery_entities.add(self.player_scenery_sprite)
-                
-                bike_img = ImageLoader.ImageLoader.GetImage("assets/imgs/bike.png")
-                self.bike_scenery_sprite = entity.SceneryEntity(self.player_sprite.position.copy(), bike_img, self)
-                dist = 100
-                bike_target = self.player_sprite.position - player_offset_normalize * dist
-                while not self.is_coord_in_mask(bike_target):
-                    dist /= 2
-                    bike_target = self.player_sprite.position - player_offset_normalize * dist
-                self.bike_scenery_sprite.add_keyframe(bike_target, 1.5)
-
-                self.scenery_entities.add(self.bike_scenery_sprite)
-
-                self.player_in_animation = True
-                self.player_sprite.set_animation('walking')
+
+                # query_radius's order changes from run to run, pick the same creature every time so replays match
+                self.knock_player_off_bike(min(colliding, key=lambda other_entity: other_entity.id))
 
         self.camera.position = self.player_sprite.position
         self.fog_timer += delta
 
+        # Creatures near the player growl from time to time, louder the closer they are
+        self.growl_timer -= delta
+        if self.growl_timer < 0:
+            self.growl_timer += GROWL_INTERVAL
+            in_earshot = self.entity_index.query_radius(self.player_sprite.position, self.audio.hearing_radius)
+            if in_earshot:
+                growler = self.random.choice(sorted(in_earshot, key=lambda other_entity: other_entity.id))
+                self.audio.play(self.sounds.get_sound(self.random.choice(self.growl_noises)), growler)
+        self.audio.update(delta, self.player_sprite.position)
+
         # Play ambient sounds from time to time to keep the player on edge
-        # TODO: Make the sounds get louder the closer to an enemy you are?
         self.sound_timer -= delta
         if self.sound_timer < 0:
-            sound_choice = random.choice(self.ambient_noises)
-            self.sound_library[sound_choice].play()
+            sound_choice = self.random.choice(self.ambient_noises)
+            self.sounds.play(sound_choice)
             self.sound_timer += 15
 
+    def knock_player_off_bike(self, other_entity: entity.Entity) -> None:
+        """The player was hit by `other_entity` while riding, send them and their bike flying in opposite directions"""
+        player_offset: pygame.Vector2 = self.player_sprite.position - other_entity.position
+        player_offset_normalize = player_offset.normalize() if player_offset else pygame.Vector2(1, 0)
+
+        sound_choice = self.random.choice(self.hurt_noises)
+        # Always heard, over any growls
+        self.audio.play(self.sounds.get_sound(sound_choice), priority=10)
+
+        self.player_sprite.on_bike = False
+        self.remove_entity(other_entity)
+
+        self.player_scenery_sprite = entity.SceneryEntity(self.player_sprite.position.copy(), None, self)
+        knockback_dist = 100
+        # Stop short of any wall in the way, the keyframes move them in a straight line
+        player_target = self.navigation.furthest_walkable(self.player_sprite.position, player_offset_normalize, knockback_dist)
+        self.player_scenery_sprite.add_keyframe(player_target, 2.0)
+        self.player_scenery_sprite.add_animation('falling', self.player_sprite.animations['falling'])
+        self.player_scenery_sprite.set_animation('falling')
+        self.scenery_entities.add(self.player_scenery_sprite)
+
+        bike_img = ImageLoader.ImageLoader.GetImage("assets/imgs/bike.png")
+        self.bike_scenery_sprite = entity.SceneryEntity(self.player_sprite.position.copy(), bike_img, self)
+        bike_target = self.navigation.furthest_walkable(self.player_sprite.position, -player_offset_normalize, knockback_dist)
+        self.bike_scenery_sprite.add_keyframe(bike_target, 1.5)
+
+        self.scenery_entities.add(self.bike_scenery_sprite)
+
+        self.player_in_animation = True
+        self.player_sprite.set_animation('walking')
+
+    def add_entity(self, other_entity: entity.Entity) -> None:
+        """Add a monster or other entity to the world"""
+        self.other_entity_group.add(other_entity)
+        self.entity_index.insert(other_entity)
+        if self.creature_physics is not None and isinstance(other_entity, creature.Creature):
+            self.creature_physics.add(other_entity)
+
+    def remove_entity(self, other_entity: entity.Entity) -> None:
+        other_entity.kill()
+        self.entity_index.remove(other_entity)
+        self.entities_near_player.discard(other_entity)
+        self.lit_entities.discard(other_entity)
+        if self.creature_physics is not None:
+            self.creature_physics.remove(other_entity)
+
     def lock_to_mask(self, sprite: pygame.sprite.Sprite, movement_vector: pygame.Vector2) -> pygame.Vector2:
-        pos = sprite.position
-        goal_pos = pos + movement_vector
-        if self.is_coord_in_mask(goal_pos):
-            return movement_vector
-        
+        """Keep `sprite` on the walkable part of the map, sliding along walls it runs into"""
+        return self.navigation.slide(sprite.position, movement_vector)
+
+    def is_coord_in_mask(self, world_coord: pygame.Vector2) -> bool:
+        return self.navigation.is_walkable(world_coord)
+
+    def render_position(self, entity: entity.Entity) -> pygame.Vector2:
+        """Where `entity` is drawn, between where it was before the last update and where it is now"""
+        previous = self.previous_positions.get(entity)
+        if previous is None or self.render_alpha >= 1:
+            return entity.position
+        return previous.lerp(entity.position, self.render_alpha)
+
+    def screen_rect(self, entity: entity.Entity) -> pygame.Rect:
+        """Where on the screen `entity` is drawn"""
+        new_rect = entity.rect.copy()
+        new_rect.center = self.camera.world_to_screen(self.render_position(entity))
+        return new_rect
+
+    def visible_entities(self, group: pygame.sprite.Group, view_rect: pygame.Rect, index: SpatialHash | None = None) -> list[entity.Entity]:
+        """The entities of `group` that overlap `view_rect` (in world space), in the order they are drawn.
+        If `index` holds the group's entities only the ones near `view_rect` are looked at."""
+        if index is None:
+            candidates = group
         else:
-            return pygame.Vector2()
-    
-    def is_coord_in_mask(self, world_coord: pygame.Vector2):
-        try:
-            return self.world_mask.get_at(world_coord)
-        except IndexError:
-            # if the world_coord is off the map
-            return False
-
-    def draw_group_offset(self, group: pygame.sprite.Group, surface: pygame.Surface) -> None:
-        """Draw the entities in a group relative to the camera"""
-        for entity in group:
-            new_pos = self.camera.world_to_screen(entity.position)
-            new_rect = entity.rect.copy()
-            new_rect.center = new_pos
-            surface.blit(entity.image, new_rect)
-
-    def draw(self, surface: pygame.Surface) -> None:
-        """Draw the game world, the entities, and then constrain what the player can see"""
-        self.create_fog_images()
-        surface.blit(self.world_background, self.camera.world_to_screen(pygame.Vector2()))
-        self.draw_group_offset(self.other_entity_group, surface)
+            # The hash only knows where their centers are, so look far enough around for the biggest sprites
+            candidates = sorted(index.query_rect(view_rect.inflate(256, 256)), key=lambda entity: entity.id)
+
+        scale = self.camera.scale
+        left, top, right, bottom = view_rect.left, view_rect.top, view_rect.right, view_rect.bottom
+        visible = []
+        for entity in candidates:
+            # Checked against the sprite's size without copying its rect, most of them won't be drawn
+            half_width = entity.rect.width / 2 / scale
+            half_height = entity.rect.height / 2 / scale
+            position = self.render_position(entity)
+            if (position.x + half_width > left and position.x - half_width < right and
+                    position.y + half_height > top and position.y - half_height < bottom):
+                visible.append(entity)
+        return visible
+
+    def draw_group_offset(self, group: pygame.sprite.Group | list[entity.Entity], surface: pygame.Surface, index: SpatialHash | None = None) -> None:
+        """Draw the entities in a group (or list) relative to the camera, skipping the ones outside of the
+        surface's clip area. `index` can be a SpatialHash of the group's entities to find them quicker"""
+        view_rect = self.camera.screen_rect_to_world(surface.get_clip())
+        for entity in self.visible_entities(group, view_rect, index):
+            surface.blit(entity.image, self.screen_rect(entity))
+
+    def on_screen_entities(self, surface: pygame.Surface) -> list[list[entity.Entity]]:
+        """The entities of each of the sprite groups that are on `surface`, from the bottom up.
+        Also counts how many are drawn and culled this frame."""
+        view_rect = self.camera.screen_rect_to_world(surface.get_rect())
+        on_screen = []
+        self.drawn_count = 0
+        self.culled_count = 0
+        for group, index in self.sprite_groups():
+            visible = self.visible_entities(group, view_rect, index)
+            on_screen.append(visible)
+            self.drawn_count += len(visible)
+            self.culled_count += len(group) - len(visible)
+        return on_screen
+
+    def sprite_groups(self) -> list[tuple[pygame.sprite.Group, SpatialHash | None]]:
+        """The groups of entities to draw from the bottom up, with the index of their entities if they have one"""
+        groups = [(self.prop_entities, self.prop_index), (self.other_entity_group, self.entity_index)]
         if not self.player_in_animation:
-            self.draw_group_offset(self.player_group, surface)
-        self.draw_group_offset(self.scenery_entities, surface)
-        self.draw_group_offset(self.light_group, surface)
+            groups.append((self.player_group, None))
+        groups += [(self.scenery_entities, None), (self.light_group, None)]
+        return groups
+
+    def redraw_everything(self) -> None:
+        """Make the next draw cover the whole screen, like after something else was drawn over it"""
+        if self.dirty_rects is not None:
+            self.dirty_rects.invalidate()
+
+    def find_dirty_areas(self, on_screen: list[list[entity.Entity]]) -> list[pygame.Rect]:
+        """The parts of the screen that changed since the last frame, given the entities on the screen
+        (see on_screen_entities). When the camera moves everything on the screen moves with it, so all
+        of it has to be redrawn."""
+        camera_state = (self.camera.position.x, self.camera.position.y, self.camera.scale)
+        if camera_state != self.last_camera_state:
+            self.dirty_rects.invalidate()
+            self.last_camera_state = camera_state
+
+        if self.fog.changed:
+            self.dirty_rects.add(self.fog.redraw_area)
+        for visible in on_screen:
+            for entity in visible:
+                self.dirty_rects.track(entity, entity.image, self.screen_rect(entity))
+        return self.dirty_rects.finish()
+
+    def draw(self, surface: pygame.Surface, alpha: float = 1.0) -> list[pygame.Rect]:
+        """Draw the game world, the entities, and then constrain what the player can see.
+        `alpha` is how far along the way from the previous update to the last one to draw
+        everything (see FramePacer). Returns the parts of `surface` that were drawn, to pass
+        on to pygame.display.update
+        """
+        self.render_alpha = alpha
+        camera_position = self.camera.position
+        if alpha < 1:
+            self.camera.position = self.previous_camera_position.lerp(camera_position, alpha)
+        try:
+            return self.draw_frame(surface)
+        finally:
+            self.camera.position = camera_position
+
+    def draw_frame(self, surface: pygame.Surface) -> list[pygame.Rect]:
+        with self.timer.phase("fog update"):
+            self.create_fog_images()
+
+        with self.timer.phase("sprites"):
+            # Culled once for the whole screen, each area only looks through what's left
+            on_screen = self.on_screen_entities(surface)
+        if self.dirty_rects is None:
+            areas = [surface.get_rect()]
+        else:
+            with self.timer.phase("dirty rects"):
+                areas = self.find_dirty_areas(on_screen)
+
+        for area in areas:
+            # Everything drawn is clipped to the area, so only its pixels are touched
+            surface.set_clip(area)
+            with self.timer.phase("background"):
+                surface.fill(BACKGROUND_COLOR, area)
+                self.world_background.draw(surface, self.camera)
+
+            with self.timer.phase("sprites"):
+                for visible in on_screen:
+                    self.draw_group_offset(visible, surface)
+
+            with self.timer.phase("fog blit"):
+                surface.blit(self.fog.image, area, area)
+        surface.set_clip(None)
 
-        surface.blit(self.fog_image, (0, 0))
\ No newline at end of file
+        return areas